@@ -1,27 +1,47 @@
 import streamlit as st
-import fitz
-from openai import OpenAI, AuthenticationError
-from io import BytesIO
+from common.chunking import chunk_by_tokens
+from common.clients import get_llm_gateway, get_openai_client, validate_openai_key
+from common.llm_gateway import Route
+from common.embeddings import embed_text
+from common.pdf_text import extract_pdf_text
+from common.tokens import count_tokens
+
+# Documents above this size default to retrieval mode.
+RETRIEVAL_MIN_TOKENS = 8000
+RETRIEVAL_TOP_K = 6
 
 # Validate Open AI key function for lab, used below
 def validate_api_key(api_key):
-    try:
-        client = OpenAI(api_key=api_key)
-        client.models.list()
-        #random openAI function to check validity
-        return True, "API key is valid"
-    except AuthenticationError:
-        return False, "Invalid API key"
-    except Exception as e:
-        return False, f"Error validating API key: {str(e)}"
+    # Memoized per key across reruns and sessions, so typing in the page
+    # doesn't trigger a models.list() round trip every time.
+    return validate_openai_key(api_key)
     
-def extract_text_from_pdf(pdf_file):
-    document = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    text = ''
-    for page_num in range(len(document)):
-        page = document.load_page(page_num)
-        text += page.get_text()
-    return text
+def extract_text_from_pdf(pdf_bytes):
+    # Large uploads are split across processes by page range.
+    return extract_pdf_text(pdf_bytes, workers=4)
+
+
+def get_document(file_bytes, file_extension, file_hash):
+    """Extract an upload once and reuse the text across reruns."""
+    documents = st.session_state.setdefault("documents", {})
+    if file_hash not in documents:
+        if file_extension == 'pdf':
+            documents[file_hash] = extract_text_from_pdf(file_bytes)
+        else:
+            documents[file_hash] = file_bytes.decode()
+    return documents[file_hash]
+
+
+def get_document_index(client, document, file_hash):
+    """Chunk and embed an upload once, keyed by its content hash."""
+    from common.memory_index import MemoryIndex
+
+    indexes = st.session_state.setdefault("document_indexes", {})
+    if file_hash not in indexes:
+        with st.spinner("Indexing document for retrieval..."):
+            chunks = chunk_by_tokens(document, file_hash[:12])
+            indexes[file_hash] = MemoryIndex.build(client, chunks)
+    return indexes[file_hash]
 
 # Show title and description.
 st.title("Nick's document question answering")
@@ -50,8 +70,8 @@ else:
 # if valid, continue
 if openai_api_key:
 
-    # Create an OpenAI client.
-    client = OpenAI(api_key=openai_api_key)
+    # Reuse the shared OpenAI client for this key.
+    client = get_openai_client(openai_api_key)
 
 
 
@@ -72,26 +92,47 @@ if openai_api_key:
 
         # Process the uploaded file and question.
         file_extension = uploaded_file.name.split('.')[-1]
-        if file_extension == 'txt':
-            document = uploaded_file.read().decode()
-        elif file_extension == 'pdf':
-            document = extract_text_from_pdf(uploaded_file)
-        else:
+        if file_extension not in ('txt', 'md', 'pdf'):
             st.error("Unsupported file type.")
             st.stop()
 
+        # memory_index (numpy) is only imported once there is a document.
+        from common.memory_index import content_hash
+
+        file_bytes = uploaded_file.getvalue()
+        file_hash = content_hash(file_bytes)
+        document = get_document(file_bytes, file_extension, file_hash)
+        document_tokens = count_tokens(document)
+
+        # Large documents are chunked and embedded once, and only the most
+        # relevant chunks are sent with each question.
+        use_retrieval = st.checkbox(
+            "Retrieval mode (send only the most relevant parts of the document)",
+            value=document_tokens > RETRIEVAL_MIN_TOKENS,
+        )
+
+        if use_retrieval:
+            index = get_document_index(client, document, file_hash)
+            hits = index.search(embed_text(client, question), k=RETRIEVAL_TOP_K)
+            excerpts = "\n\n---\n\n".join(chunk['text'] for _, chunk in hits)
+            content = f"Here are the most relevant excerpts of a document: {excerpts} \n\n---\n\n {question}"
+        else:
+            content = f"Here's a document: {document} \n\n---\n\n {question}"
+
+        st.caption(
+            f"Sending {count_tokens(content):,} of the document's {document_tokens:,} tokens"
+        )
+
         messages = [
             {
                 "role": "user",
-                "content": f"Here's a document: {document} \n\n---\n\n {question}",
+                "content": content,
             }
         ]
 
-        # Generate an answer using the OpenAI API.
-        stream = client.chat.completions.create(
-            model="gpt-5-chat-latest",
-            messages=messages,
-            stream=True,
+        # Generate an answer through the gateway (deadline + retries).
+        stream = get_llm_gateway(openai_api_key).stream_sync(
+            messages, Route("openai", "gpt-5-chat-latest")
         )
 
         # Stream the response to the app using `st.write_stream`.
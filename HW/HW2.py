@@ -1,29 +1,22 @@
 import streamlit as st
 import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI, AuthenticationError
-import google.generativeai as genai
+from common.clients import get_llm_gateway, validate_openai_key
+from common.llm_gateway import Route
+from common.fetch import fetch_text
 
 
 # Validate Open AI key function for lab, used below
 def validate_api_key(api_key):
-    try:
-        client = OpenAI(api_key=api_key)
-        client.models.list()
-        #random openAI function to check validity
-        return True, "API key is valid"
-    except AuthenticationError:
-        return False, "Invalid API key"
-    except Exception as e:
-        return False, f"Error validating API key: {str(e)}"
+    # Memoized per key across reruns and sessions, so typing in the page
+    # doesn't trigger a models.list() round trip every time.
+    return validate_openai_key(api_key)
     
 
 def read_url_content(url):
+    # Pooled session with timeouts; unchanged pages are served from the
+    # on-disk cache after a conditional GET.
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        return soup.get_text(separator=" ", strip=True)
+        return fetch_text(url)
     except requests.RequestException as e:
         st.error(f"Error reading {url}: {e}")
         return None
@@ -35,22 +28,17 @@ def google_gen(model_type, question_to_ask):
         st.error("Missing google_apikey in Streamlit secrets.")
         st.stop()
 
-    # Configure Gemini
-    genai.configure(api_key=api_key)
-
     # Select model based on type
     if "pro" in model_type:
-        model = genai.GenerativeModel("gemini-3-pro-preview")
+        model = "gemini-3-pro-preview"
     elif "lite" in model_type:
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
+        model = "gemini-2.5-flash-lite"
     else:
-        model = genai.GenerativeModel("gemini-3-flash-preview")
-
+        model = "gemini-3-flash-preview"
 
-    # Gemini expects a single prompt
-    response = model.generate_content(f"URL content:\n\n{page_text}\n\n---\n\n{effective_question_language}")
-
-    return response.text
+    # Gemini expects a single prompt; stream it through the gateway
+    messages = [{"role": "user", "content": f"URL content:\n\n{page_text}\n\n---\n\n{question_to_ask}"}]
+    return get_llm_gateway(gemini_key=api_key).stream_sync(messages, Route("gemini", model))
 
 # Side bar controls
 
@@ -132,8 +120,6 @@ if st.button("Generate response", disabled=not url):
     effective_question_language = f"{effective_question} {language}"
 
     if llm_choice == "OpenAI":
-        # Create an OpenAI client.
-        client = OpenAI(api_key=openai_api_key)
         model_name = "gpt-4o" if use_advanced_model else "gpt-4o-mini"
         
         messages = [
@@ -142,11 +128,9 @@ if st.button("Generate response", disabled=not url):
                 "content": f"URL content:\n\n{page_text}\n\n---\n\n{effective_question_language}"
             }
         ]
-        # Generate an answer using the OpenAI API.
-        stream = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            stream=True,
+        # Generate an answer through the gateway (deadline + retries).
+        stream = get_llm_gateway(openai_api_key).stream_sync(
+            messages, Route("openai", model_name)
         )
 
         # Stream the response to the app using `st.write_stream`.
@@ -154,6 +138,6 @@ if st.button("Generate response", disabled=not url):
 
     elif llm_choice == "Gemini":
         model_name = "pro" if use_advanced_model else "lite"
-        response = google_gen(model_name, effective_question_language)
-        st.write(response)
+        stream = google_gen(model_name, effective_question_language)
+        st.write_stream(stream)
 
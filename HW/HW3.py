@@ -1,32 +1,23 @@
+import time
+
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
-from openai import OpenAI, AuthenticationError
-import google.generativeai as genai
+from common.chunking import chunk_by_tokens
+from common.clients import get_llm_gateway, get_openai_client
+from common.llm_gateway import CallStats, Route
+from common.context_window import ContextWindow, count_message_tokens
+from common.embeddings import embed_text
+from common.tokens import count_tokens
+from common.tracing import diagnostics_toggle, keep_trace, record_llm_call, show_diagnostics, start_trace
 
 
 st.title('Nicks Lab3 Question answering chatbot')
 
-def read_url_content(url):
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        return soup.get_text(separator=" ", strip=True)
-    except requests.RequestException as e:
-        st.error(f"Error reading {url}: {e}")
-        return None
-
-def apply_buffer():
-    MAX_HISTORY = 6  
-    msgs = st.session_state.messages
-    system_msg = msgs[:1]   
-    rest = msgs[1:]         
+# Chat history is trimmed by tokens, not message count (was the last 6).
+CONTEXT_WINDOW = ContextWindow(max_tokens=4000)
 
-    if len(rest) > MAX_HISTORY:
-        rest = rest[-MAX_HISTORY:]
 
-    st.session_state.messages = system_msg + rest
+def apply_buffer():
+    st.session_state.messages = CONTEXT_WINDOW.fit(st.session_state.messages)
 
 def build_system_prompt_with_urls(url_text: str) -> str:
     if url_text and url_text.strip():
@@ -34,32 +25,54 @@ def build_system_prompt_with_urls(url_text: str) -> str:
     return BASE_SYSTEM_PROMPT
 
 
-def call_openai(messages):
-    if "client" not in st.session_state:
-        st.session_state.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-
-    client = st.session_state.client
-    stream = client.chat.completions.create(
-        model=model_to_use,
-        messages=messages,
-        stream=True
+# Loaded pages are chunked and embedded once; each turn only sends the
+# passages closest to the question instead of both whole pages.
+URL_TOP_K = 5
+URL_PASSAGES_PREFIX = "URL CONTEXT (most relevant passages from the user's URLs):"
+
+
+def build_url_index(pages):
+    """Embed ``(label, url, text)`` pages into one in-memory index."""
+    # numpy comes with memory_index; only import it once URLs are loaded.
+    from common.memory_index import MemoryIndex
+
+    client = get_openai_client(st.secrets["OPENAI_API_KEY"])
+    chunks = []
+    for n, (label, u, text) in enumerate(pages, start=1):
+        chunks.extend(chunk_by_tokens(text, f"url{n}", header=f"{label} ({u})"))
+    return MemoryIndex.build(client, chunks)
+
+
+def url_passages_message(question):
+    """Return the per-turn system message with the top passages, and stats."""
+    start = time.perf_counter()
+    client = get_openai_client(st.secrets["OPENAI_API_KEY"])
+    hits = st.session_state.url_index.search(embed_text(client, question), k=URL_TOP_K)
+    passages = "\n\n---\n\n".join(chunk['text'] for _, chunk in hits)
+    elapsed = time.perf_counter() - start
+    return {"role": "system", "content": f"{URL_PASSAGES_PREFIX}\n{passages}"}, elapsed
+
+
+# The other vendor's model, used as a fallback (or hedge) when its key is set.
+FALLBACK_ROUTES = {
+    "OpenAI": Route("gemini", "gemini-3-pro-preview"),
+    "Gemini": Route("openai", "gpt-5-chat-latest"),
+}
+HEDGE_AFTER_SECONDS = 4.0
+
+
+def call_llm(messages, stats=None):
+    """Stream a reply from the selected vendor through the shared gateway."""
+    gateway = get_llm_gateway(st.secrets.get("OPENAI_API_KEY"), st.secrets.get("GEMINI_API_KEY"))
+    route = Route("openai" if vendor == "OpenAI" else "gemini", model_to_use)
+    fallback = FALLBACK_ROUTES[vendor]
+    if not gateway.has_provider(fallback.provider):
+        fallback = None
+    return gateway.stream_sync(
+        messages, route, fallback=fallback,
+        hedge_after=HEDGE_AFTER_SECONDS if hedge_requests and fallback else None,
+        stats=stats,
     )
-    return stream
-
-def call_gemini(messages):
-    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
-    model = genai.GenerativeModel(model_to_use)
-
-    system_text = messages[0]["content"]
-    convo_lines = [f"SYSTEM: {system_text}"]
-
-    for m in messages[1:]:
-        role = m["role"].upper()
-        convo_lines.append(f"{role}: {m['content']}")
-
-    prompt_text = "\n".join(convo_lines)
-
-    return model.generate_content(prompt_text, stream=True)
 
 BASE_SYSTEM_PROMPT = """
 You are a helpful chatbot.
@@ -96,9 +109,19 @@ else:
         ("gemini-3-pro-preview",)      
     )
 
+hedge_requests = st.sidebar.checkbox(
+    "Ask the other LLM too if the first is slow",
+    help=f"If no answer has started after {HEDGE_AFTER_SECONDS:.0f}s, the other vendor is asked as well and the faster one is used.",
+)
+
+diagnostics = diagnostics_toggle()
+
 if "url_text" not in st.session_state:
     st.session_state.url_text = ""
 
+if "url_index" not in st.session_state:
+    st.session_state.url_index = None
+
 if "messages" not in st.session_state:
     st.session_state.messages = [
         {"role": "system", "content": build_system_prompt_with_urls(st.session_state.url_text)},
@@ -114,22 +137,45 @@ if "last_topic" not in st.session_state:
 
 if load_urls:
     texts = []
+    requested = [(label, u.strip()) for label, u in (("URL 1", url1), ("URL 2", url2)) if u.strip()]
+    trace = start_trace("HW3.load_urls", enabled=diagnostics)
+
+    # Both URLs are fetched at the same time. (requests is only imported
+    # once the user loads URLs.)
+    from common.fetch import fetch_many
 
-    if url1.strip():
-        t1 = read_url_content(url1.strip())
-        if t1:
-            texts.append(f"URL 1 ({url1.strip()}):\n{t1}")
+    with trace.span("fetch", urls=len(requested)) as span:
+        fetched, errors = fetch_many([u for _, u in requested])
+        span["errors"] = len(errors)
+    for u, e in errors.items():
+        st.error(f"Error reading {u}: {e}")
 
-    if url2.strip():
-        t2 = read_url_content(url2.strip())
-        if t2:
-            texts.append(f"URL 2 ({url2.strip()}):\n{t2}")
+    pages = [(label, u, fetched[u]) for label, u in requested if fetched.get(u)]
+    for label, u, text in pages:
+        texts.append(f"{label} ({u}):\n{text}")
 
     st.session_state.url_text = "\n\n---\n\n".join(texts)
 
-    st.session_state.messages[0]["content"] = build_system_prompt_with_urls(st.session_state.url_text)
+    # Retrieval needs OpenAI embeddings; without a key the whole pages go
+    # into the system prompt as before.
+    st.session_state.url_index = None
+    if pages and st.secrets.get("OPENAI_API_KEY"):
+        with st.spinner("Indexing URL text..."), trace.span("chunk_embed") as span:
+            st.session_state.url_index = build_url_index(pages)
+            span["chunks"] = len(st.session_state.url_index)
+    keep_trace("HW3", trace)
+
+    if st.session_state.url_index is not None:
+        st.session_state.messages[0]["content"] = BASE_SYSTEM_PROMPT
+    else:
+        st.session_state.messages[0]["content"] = build_system_prompt_with_urls(st.session_state.url_text)
 
-    if st.session_state.url_text.strip():
+    if st.session_state.url_index is not None:
+        st.sidebar.success(
+            f"Indexed {len(st.session_state.url_index)} passages "
+            f"({st.session_state.url_index.total_tokens:,} tokens) from the URL text!"
+        )
+    elif st.session_state.url_text.strip():
         st.sidebar.success("Loaded URL text and updated system context!")
     else:
         st.sidebar.warning("No URL text loaded (check your URLs).")
@@ -174,20 +220,41 @@ if prompt := st.chat_input("Type here..."):
 
     st.session_state.messages.append({"role": "user", "content": user_text})
 
+    trace = start_trace("HW3.turn", enabled=diagnostics, vendor=vendor, model=model_to_use)
+    retrieval_seconds = None
+    if st.session_state.url_index is not None:
+        with trace.span("retrieve", k=URL_TOP_K):
+            passages_message, retrieval_seconds = url_passages_message(user_text)
+        st.session_state.messages.insert(-1, passages_message)
+
     apply_buffer()
 
     with st.chat_message("assistant"):
-        if vendor == "OpenAI":
-            stream = call_openai(st.session_state.messages)
-            response = st.write_stream(stream)
+        start = time.perf_counter()
+        llm_stats = CallStats()
+        response = st.write_stream(call_llm(st.session_state.messages, llm_stats))
+        elapsed = time.perf_counter() - start
+        input_tokens = count_message_tokens(st.session_state.messages)
+        record_llm_call(trace, llm_stats, response, input_tokens=input_tokens)
+        if retrieval_seconds is None:
+            st.caption(f"Input: {input_tokens:,} tokens · {elapsed:.1f}s")
         else:
-            gstream = call_gemini(st.session_state.messages)
-            chunks = []
-            for chunk in gstream:
-                if hasattr(chunk, "text") and chunk.text:
-                    chunks.append(chunk.text)
-                    st.write(chunk.text)
-            response = "".join(chunks).strip()
+            # What this turn would have cost with both pages in the system prompt.
+            whole_pages = input_tokens - count_tokens(passages_message["content"]) \
+                + count_tokens(st.session_state.url_text)
+            st.caption(
+                f"Input: {input_tokens:,} tokens (whole pages: ~{whole_pages:,}) · "
+                f"retrieval {retrieval_seconds * 1000:.0f} ms · answer {elapsed:.1f}s"
+            )
 
     st.session_state.messages.append({"role": "assistant", "content": response})
-    apply_buffer()
\ No newline at end of file
+    # Passages are per turn; later turns retrieve their own.
+    st.session_state.messages = [
+        msg for msg in st.session_state.messages
+        if not (msg["role"] == "system" and msg["content"].startswith(URL_PASSAGES_PREFIX))
+    ]
+    apply_buffer()
+    keep_trace("HW3", trace)
+
+
+show_diagnostics("HW3")
@@ -1,163 +1,53 @@
 import streamlit as st
-from openai import OpenAI, AuthenticationError
-import sys
-import chromadb
-from pathlib import Path
-from bs4 import BeautifulSoup
-
-__import__('pysqlite3')
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-
-
-def extract_text_from_html(html_path):
-    "Extract text from a HTML file"
-    try:
-        with open(html_path, 'r', encoding='utf-8') as file:
-            soup = BeautifulSoup(file, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            text = soup.get_text()
-            # Clean up text
-            text = " ".join(text.split())
-            return text
-    except Exception as e:
-        st.error(f"Error reading {html_path}: {str(e)}")
-        return None
-
-def add_to_collection(collection, text, file_name):
-    try:
-
-        client = st.session_state.openai_client
-        
-
-        response = client.embeddings.create(
-            input=text,
-            model='text-embedding-3-small'
-        )
-        
-
-        embedding = response.data[0].embedding
-        
-        collection.add(
-            documents=[text],
-            ids=[file_name],
-            embeddings=[embedding]
-        )
-        return True
-    except Exception as e:
-        st.error(f"Error adding {file_name} to collection: {str(e)}")
-        return False
-
-
-def load_htmls_to_collection(folder_path, collection):
-    """Load all htmls from folder into the collection"""
-    # Check if collection is empty and load PDFs
-    if collection.count() == 0:
-        html_files = list(Path(folder_path).glob("*.html"))
-        
-        if not html_files:
-            st.warning(f"No HTML files found in {folder_path}")
-            return False
-        
-        all_chunks = []
-        for html_path in html_files:
-            # Extract text from HTML
-            text = extract_text_from_html(html_path)
-            
-            if text:
-                # Add to collection
-                chunks= chunk_text(text, html_path.name, num_chunks = 4)
-                all_chunks.extend(chunks)
-        
-        if all_chunks:
-            fixed_size_chunks_to_collection(collection, all_chunks)
-            st.success(f"✅ Successfully loaded {len(html_files)} HTML files ({len(all_chunks)} chunks) into ChromaDB")
-        
-            return True
-        else:
-            st.info(f"Collection already contains {collection.count()} documents")
-            return True
-        
-def chunk_text(text, file_name, num_chunks=2):
-    """I used fixed-size chunking for this assignment because the directions
-    asked for 2 mini documents for each. So splitting them into 2 chunks will be easiest since
-    the documents are simple and only a few sections long. Additionally, this is a simple
-    chunking method.
-
-    The tradeoff is that it may split the document in the middle of a sentence or section
-    but since the document is about student orgs, theyre smaller and structured the same way across the board.
+from common.answer_cache import answer_cache_sidebar, replay_stream
+from common.clients import get_llm_gateway, get_openai_client
+from common.context_window import ContextWindow, count_message_tokens, is_summary
+from common.documents import HTML_CHUNKER_VERSION, parse_html_file
+from common.embeddings import embed_text
+from common.ingest import manifest_fingerprint
+from common.ingest_worker import Corpus, open_store, resync, show_ingestion
+from common.lexical import hybrid_query
+from common.llm_gateway import CallStats, Route
+from common.rerank import MMR_CANDIDATES, diversify
+from common.tracing import (
+    diagnostics_toggle, keep_trace, record_llm_call, record_stages, show_diagnostics, start_trace,
+)
+
+HW4_CORPUS = Corpus(
+    key="HW4", name="HW4 organizations", folder="./HW4-Data/su_orgs", pattern="*.html", kind="HTML",
+    parse_fn=parse_html_file, chunker_version=HTML_CHUNKER_VERSION,
+    store_path="./ChromaDB_for_HW", collection_name="HW4Collection", quota=1,
+)
+HW4_MANIFEST = HW4_CORPUS.manifest
+# Context for a question: up to this many distinct chunks within the budget
+# (about what three undiversified chunks used to cost).
+HW4_CONTEXT_CHUNKS = 4
+HW4_CONTEXT_TOKENS = 240
+
+
+@st.cache_resource
+def load_hw4_store():
+    """Open the collection once per process and queue its sync.
+
+    Every session shares the store, and the course assistant (HW5) can
+    search it too.
     """
+    return open_store(HW4_CORPUS, get_openai_client(st.secrets["OPENAI_API_KEY"]))
 
 
-    chunk_size = len(text) // num_chunks
-    chunks = []
-    
-    for i in range(num_chunks):
-        start = i * chunk_size
-        end = start + chunk_size if i < num_chunks - 1 else len(text)
-        chunk = text[start:end].strip()
-        
-        if chunk:  
-            chunks.append({
-                'text': chunk,
-                'id': f"{file_name}_chunk_{i+1}"
-            })
-    
-    return chunks
-
-def fixed_size_chunks_to_collection(collection, chunks):
-    """Add chunks to collection"""
-
-    try:
-        client = st.session_state.openai_client
-
-        texts = [chunk['text'] for chunk in chunks]
-        ids = [chunk['id'] for chunk in chunks]
-
-        response = client.embeddings.create(
-            input = texts,
-            model = 'text-embedding-3-small'
-        )
-
-        embeddings = [item.embedding for item in response.data]
-
-        collection.add(
-            documents=texts,
-            ids=ids,
-            embeddings=embeddings
-        )
-        return True
-    except Exception as e:
-        st.error(f"Error adding chunks to collection:  {str(e)}")
-        return False
+# Shared across sessions; kept in session_state for the helpers below.
+st.session_state.openai_client = get_openai_client(st.secrets["OPENAI_API_KEY"])
 
+hw4_store = load_hw4_store()
+show_ingestion(hw4_store)
 
-if 'openai_client' not in st.session_state:
-    st.session_state.openai_client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
 
-if 'HW4_VectorDB' not in st.session_state:
-    with st.spinner("Initializing ChromaDB and loading HTMLS.."):
-        chroma_client = chromadb.PersistentClient(path='./ChromaDB_for_HW')
-        collection = chroma_client.get_or_create_collection('HW4Collection')
-    
-
-        load_htmls_to_collection('./HW4-Data/su_orgs', collection)
-        
-        st.session_state.HW4_VectorDB = collection
+# Chat history is trimmed by tokens, not message count (was the last 10).
+CONTEXT_WINDOW = ContextWindow(max_tokens=3000)
 
 
 def apply_buffer():
-    MAX_HISTORY = 10
-
-    msgs = st.session_state.messages
-    system_msg = msgs[:1]
-    rest = msgs[1:]    
-
-    if len(rest) > MAX_HISTORY:
-        rest = rest[-MAX_HISTORY:]
-
-    st.session_state.messages = system_msg + rest
+    st.session_state.messages = CONTEXT_WINDOW.fit(st.session_state.messages)
 
 
 
@@ -171,6 +61,14 @@ if openAI_model == 'mini':
 else:
     model_to_use = 'gpt-4o'
 
+answer_cache, use_answer_cache, answer_cache_threshold = answer_cache_sidebar('HW4')
+
+if st.sidebar.button("Re-sync documents", help="Pick up added, changed or removed HTML files.",
+                     disabled=not hw4_store.progress.finished):
+    resync(hw4_store, st.session_state.openai_client)
+    st.rerun()
+
+diagnostics = diagnostics_toggle()
 
 
 # Lab 3 chat bot 
@@ -201,23 +99,32 @@ if prompt := st.chat_input("Ask about org topics..."):
         st.markdown(prompt)
     
     client = st.session_state.openai_client
-    collection = st.session_state.HW4_VectorDB
-    
-    response = client.embeddings.create(
-        input=prompt,
-        model='text-embedding-3-small'
-    )
-    query_embedding = response.data[0].embedding
+    collection = hw4_store.collection
+    trace = start_trace("HW4.turn", enabled=diagnostics, model=model_to_use)
     
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=3  
-    )
+    # Exact org names are answered from the BM25 index without an embedding
+    # call; other questions fuse BM25 and vector rankings. Candidates are
+    # over-fetched and reranked with MMR, so near-identical chunks of one
+    # page don't fill every slot.
+    with trace.span("retrieve") as span:
+        results, retrieval = hybrid_query(
+            collection, hw4_store.lexical, prompt, lambda q: embed_text(client, q),
+            n_results=MMR_CANDIDATES,
+        )
+        results, rerank = diversify(collection, results, n_results=HW4_CONTEXT_CHUNKS,
+                                    token_budget=HW4_CONTEXT_TOKENS)
+        span["mode"] = retrieval['mode']
+        span["context_tokens"] = rerank['context_tokens']
+        record_stages(trace, [("bm25", retrieval['lexical_s'], {}), ("embed", retrieval['embed_s'], {}),
+                              ("vector_query", retrieval['vector_s'], {}),
+                              ("mmr", rerank['mmr_s'], {"candidates": rerank['candidates']})])
+    retrieval_ms = (retrieval['lexical_s'] + retrieval['embed_s'] + retrieval['vector_s'] + rerank['mmr_s']) * 1000
+    st.caption(f"Retrieval: {retrieval['mode']} ({retrieval_ms:.0f} ms)")
     
     context = ""
+    sources = results['ids'][0] if results['ids'] else []
     if results['documents'] and len(results['documents'][0]) > 0:
         context = "\n\n---\n\n".join(results['documents'][0])
-        sources = results['ids'][0]
         
         context_message = f"""
         Use the following context from student org materials to answer the question. If the answer is in this context, make sure to say "Based on the student organization info..." 
@@ -231,22 +138,50 @@ if prompt := st.chat_input("Ask about org topics..."):
         st.session_state.messages.insert(-1, {"role": "system", "content": context_message})
     
     apply_buffer()
-    
-    stream = client.chat.completions.create(
-        model=model_to_use,
-        messages=st.session_state.messages,
-        stream=True
-    )
+
+    # Near-duplicate questions answered from the same sources are replayed
+    # from the answer cache instead of calling the model again. The cache
+    # reuses retrieval's embedding; a BM25-only prompt has none and only
+    # matches the same prompt exactly.
+    query_embedding = retrieval['embedding']
+    collection_version = manifest_fingerprint(HW4_MANIFEST)
+    cached_answer = None
+    if use_answer_cache:
+        cached_answer = answer_cache.lookup(
+            query_embedding, model_to_use, sources, collection_version,
+            threshold=answer_cache_threshold, prompt=prompt,
+        )
+
+    llm_stats = CallStats()
+    if cached_answer:
+        stream = replay_stream(cached_answer)
+    else:
+        gateway = get_llm_gateway(st.secrets["OPENAI_API_KEY"])
+        stream = gateway.stream_sync(st.session_state.messages, Route("openai", model_to_use), stats=llm_stats)
     
     with st.chat_message("assistant"):
         response_text = st.write_stream(stream)
+        if not cached_answer:
+            input_tokens = count_message_tokens(st.session_state.messages)
+            st.caption(f"Input: {input_tokens} tokens")
+            record_llm_call(trace, llm_stats, response_text, input_tokens=input_tokens)
+    trace.set(answer_cache_hit=bool(cached_answer))
+    keep_trace("HW4", trace)
+
+    # Answers from a partial index aren't worth keeping.
+    if use_answer_cache and not cached_answer and hw4_store.progress.finished:
+        answer_cache.store(query_embedding, model_to_use, sources, collection_version, response_text,
+                           prompt=prompt)
     
     st.session_state.messages.append({"role": "assistant", "content": response_text})
     
   
     st.session_state.messages = [
         msg for msg in st.session_state.messages 
-        if not (msg["role"] == "system" and "Context:" in msg["content"])
+        if not (msg["role"] == "system" and "Context:" in msg["content"] and not is_summary(msg))
     ]
     
-    apply_buffer()
\ No newline at end of file
+    apply_buffer()
+
+
+show_diagnostics("HW4")
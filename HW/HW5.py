@@ -1,114 +1,173 @@
-import streamlit as st
-from openai import OpenAI, AuthenticationError
-import sys
-import chromadb
-from pathlib import Path
-from PyPDF2 import PdfReader
-
-__import__('pysqlite3')
-sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
-
-#PDF Functions
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file"""
-    try:
-        pdf_reader = PdfReader(pdf_path)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        # Clean up text (remove extra whitespace)
-        text = " ".join(text.split())
-        return text
-    except Exception as e:
-        st.error(f"Error reading {pdf_path}: {str(e)}")
-        return None
-
-
-def add_to_collection(collection, text, file_name):
-    try:
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-        client = st.session_state.openai_client
-        
+import streamlit as st
+from common.answer_cache import answer_cache_sidebar, replay_stream
+from common.clients import get_llm_gateway, get_openai_client
+from common.context_window import ContextWindow, count_message_tokens
+from common.documents import PDF_CHUNKER_VERSION, parse_pdf_file
+from common.embeddings import EmbeddingBatch, embed_text
+from common.federated import get_default_federation
+from common.ingest import manifest_fingerprint
+from common.ingest_worker import Corpus, open_store, resync, show_ingestion
+from common.lexical import hybrid_query, needs_embedding, same_search, search_key
+from common.llm_gateway import CallStats, Route
+from common.rerank import MMR_CANDIDATES, diversify, diversify_hits
+from common.tool_stream import ToolCallStream
+from common.tracing import NULL_TRACE, diagnostics_toggle, keep_trace, record_llm_call, show_diagnostics, start_trace
+
+HW5_CORPUS = Corpus(
+    key="HW5", name="HW5 syllabi", folder="./HW-05-Data/", pattern="*.pdf", kind="PDF",
+    parse_fn=parse_pdf_file, chunker_version=PDF_CHUNKER_VERSION,
+    store_path="./ChromaDB_for_Lab", collection_name="HW5Collection", quota=2,
+)
+HW5_MANIFEST = HW5_CORPUS.manifest
+# Each search returns up to this many distinct chunks within the budget
+# (about what three undiversified chunks used to cost).
+HW5_CONTEXT_CHUNKS = 4
+HW5_CONTEXT_TOKENS = 512
+
+MAX_TOOL_ROUNDS = 3
+TOOL_WORKERS = 4
+
+
+@st.cache_resource
+def load_hw5_store():
+    """Open the collection once per process and queue its sync.
+
+    Every session shares the store.
+    """
+    return open_store(HW5_CORPUS, get_openai_client(st.secrets["OPENAI_API_KEY"]))
 
-        response = client.embeddings.create(
-            input=text,
-            model='text-embedding-3-small'
-        )
-        
-
-        embedding = response.data[0].embedding
-        
-        collection.add(
-            documents=[text],
-            ids=[file_name],
-            embeddings=[embedding]
-        )
-        return True
-    except Exception as e:
-        st.error(f"Error adding {file_name} to collection: {str(e)}")
-        return False
-
-
-def load_pdfs_to_collection(folder_path, collection):
-    """Load all PDFs from folder into the collection"""
-    # Check if collection is empty and load PDFs
-    if collection.count() == 0:
-        pdf_files = list(Path(folder_path).glob("*.pdf"))
-        
-        if not pdf_files:
-            st.warning(f"No PDF files found in {folder_path}")
-            return False
-        
-        for pdf_path in pdf_files:
-            # Extract text from PDF
-            text = extract_text_from_pdf(pdf_path)
-            
-            if text:
-                # Add to collection
-                add_to_collection(collection, text, pdf_path.name)
-        
-        st.success(f"✅ Successfully loaded {len(pdf_files)} PDF files into ChromaDB")
-        return True
-    else:
-        st.info(f"Collection already contains {collection.count()} documents")
-        return True
-    
 
 # Initialize AI Client
-if 'openai_client' not in st.session_state:
-    st.session_state.openai_client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+# Shared across sessions; kept in session_state for the helpers below.
+st.session_state.openai_client = get_openai_client(st.secrets["OPENAI_API_KEY"])
 
-if 'HW5_VectorDB' not in st.session_state:
-    chroma_client = chromadb.PersistentClient(path='./ChromaDB_for_Lab')
-    collection = chroma_client.get_or_create_collection('HW5Collection')
-    load_pdfs_to_collection('./HW-05-Data/', collection)
-    st.session_state.HW5_VectorDB = collection
+hw5_store = load_hw5_store()
+show_ingestion(hw5_store)
 
 # Step 3 Vector Search
-def relevant_course_info(query):
-    client = st.session_state.openai_client
-    collection = st.session_state.HW5_VectorDB
+def course_info(collection, lexical, client, query, query_embedding=None, federation=None, embed_fn=None):
+    """Search the syllabi for query; returns ``(tool result text, retrieval info)``.
+
+    With a federation, every registered collection (the HW4 organizations
+    too) is searched with one query embedding. embed_fn defaults to one
+    embedding request for the query. Dependencies are passed in (not read
+    from session_state) so this can run on worker threads.
+    """
+    embed_fn = embed_fn or (lambda q: embed_text(client, q))
+    if federation is not None:
+        hits, retrieval = federation.search(query, embed_fn, n_results=MMR_CANDIDATES,
+                                            query_embedding=query_embedding)
+        hits, rerank = diversify_hits(federation, hits, n_results=HW5_CONTEXT_CHUNKS,
+                                      token_budget=HW5_CONTEXT_TOKENS)
+        retrieval.update(rerank)
+        documents = [hit.document for hit in hits]
+        metadatas = [hit.metadata for hit in hits]
+    else:
+        # Course codes ("IST 387") are answered from the BM25 index without an
+        # embedding call; other queries fuse BM25 and vector rankings. The
+        # candidates are reranked with MMR so overlapping chunks of one
+        # syllabus don't take every slot.
+        results, retrieval = hybrid_query(
+            collection, lexical, query, embed_fn,
+            n_results=MMR_CANDIDATES, include=('documents', 'metadatas'), query_embedding=query_embedding,
+        )
+        results, rerank = diversify(collection, results, n_results=HW5_CONTEXT_CHUNKS,
+                                    token_budget=HW5_CONTEXT_TOKENS)
+        retrieval.update(rerank)
+        documents = results['documents'][0] if results['documents'] else []
+        metadatas = results['metadatas'][0] if results['metadatas'] else []
+
+    # Each result is a page-level chunk, so only the matching page spans of
+    # a syllabus are sent back to the model rather than the whole PDF.
+    if documents:
+        passages = []
+        for text, meta in zip(documents, metadatas):
+            meta = meta or {}
+            label = meta.get('source', 'unknown')
+            if 'page' in meta:
+                label += f" (p. {meta['page']})"
+            passages.append((label, text))
+        context = "\n\n---\n\n".join(f"[{label}]\n{text}" for label, text in passages)
+        sources = ", ".join(dict.fromkeys(label for label, _ in passages))
+        return f"Sources: {sources}\n\n{context}", retrieval
+    else:
+        return "No relevant course materials found.", retrieval
 
-    response = client.embeddings.create(
-        input=query,
-        model='text-embedding-3-small'
-    )
-    query_embedding = response.data[0].embedding
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=3
-    )
+def query_key(query):
+    # A federated search also covers the organizations, which the syllabi's
+    # BM25 sources say nothing about, so it is only reused for the same terms.
+    return search_key(hw5_store.lexical if campus_search is None else None, query)
 
-    if results['documents'] and len(results['documents'][0]) > 0:
-        context = "\n\n---\n\n".join(results['documents'][0])
-        sources = ", ".join(results['ids'][0])
-        return f"Sources: {sources}\n\n{context}"
-    else:
-        return "No relevant course materials found."
 
+def tool_query(call):
+    """Return ``(query, None)`` for a course search call, or ``(None, error)``."""
+    if call.name != "relevant_course_info":
+        return None, f"Error: unknown tool {call.name}."
+    try:
+        return str(json.loads(call.arguments)["query"]), None
+    except (ValueError, KeyError, TypeError) as e:
+        return None, f"Error: could not read the tool arguments ({e})."
+
+
+def search_for(query, pool, batch, prefetched=None):
+    """Future of course_info for query, reusing the prefetched prompt search.
+
+    A query that needs an embedding (BM25 can't answer it alone, or the
+    search is federated) is added to batch and waits for its flush.
+    """
+    if prefetched is not None and same_search(query_key(query), prefetched[0]):
+        return prefetched[1]
+    if campus_search is not None or needs_embedding(hw5_store.lexical, query):
+        batch.add(query)
+    return pool.submit(course_info, hw5_store.collection, hw5_store.lexical, st.session_state.openai_client,
+                       query, federation=campus_search, embed_fn=batch.embed)
+
+
+def run_tool_calls(tool_calls, pool, batch, searches=None, prefetched=None, trace=NULL_TRACE):
+    """Answer every tool call of one assistant message; returns tool messages.
+
+    Calls whose search started while the reply was streaming (``searches``,
+    call id -> future) have run their BM25 part already. A query matching
+    the prefetched ``(query_key, future)`` search of the prompt reuses it.
+    The rest are started now. Every query of the round that needs an
+    embedding, started early or now, goes out in one flush of batch, and
+    the searches run concurrently on pool.
+    """
+    searches = dict(searches or {})
+    results, pending = {}, {}
+    for call in tool_calls:
+        query, error = tool_query(call)
+        if error:
+            results[call.id] = error
+        elif call.id not in searches:
+            pending[call.id] = query
+
+    with trace.span("tools", calls=len(tool_calls), started_early=len(searches)):
+        for call_id, query in pending.items():
+            searches[call_id] = search_for(query, pool, batch, prefetched)
+        with trace.span("embed") as span:
+            try:
+                span["texts"] = batch.flush()
+            except Exception:
+                # The searches waiting on it fail with the same error below.
+                pass
+
+        with trace.span("retrieve", queries=len(searches)) as span:
+            for call_id, future in searches.items():
+                try:
+                    results[call_id], retrieval = future.result()
+                except Exception as e:
+                    results[call_id] = f"Error: the course search failed ({e})."
+                    continue
+                span.setdefault("modes", []).append(retrieval['mode'])
+
+    return [{"role": "tool", "tool_call_id": call.id, "content": results[call.id]} for call in tool_calls]
 
-    
 
 # Tool function for LLM about retrieving info from courses
 tools = [
@@ -133,17 +192,12 @@ tools = [
 
 
 # Short Term Memory Buffer
-def apply_buffer():
-    MAX_HISTORY = 4  
-
-    msgs = st.session_state.messages
-    system_msg = msgs[:1]
-    rest = msgs[1:]    
+# Chat history is trimmed by tokens, not message count (was the last 4).
+CONTEXT_WINDOW = ContextWindow(max_tokens=3000)
 
-    if len(rest) > MAX_HISTORY:
-        rest = rest[-MAX_HISTORY:]
 
-    st.session_state.messages = system_msg + rest
+def apply_buffer():
+    st.session_state.messages = CONTEXT_WINDOW.fit(st.session_state.messages)
 
 
 st.title('Nicks HW5')
@@ -156,6 +210,31 @@ if openAI_model == 'GPT4':
 else:
     model_to_use = 'gpt-4o-mini'
 
+answer_cache, use_answer_cache, answer_cache_threshold = answer_cache_sidebar('HW5')
+
+prefetch_retrieval = st.sidebar.checkbox(
+    "Search the syllabi while the model decides", value=True,
+    help="Start the course search for your question before the model asks for it.",
+)
+
+# The HW4 organizations are searchable once that page has loaded them in this process.
+federation = get_default_federation()
+search_orgs = st.sidebar.checkbox(
+    "Also search student organizations", value=False, disabled=len(federation.sources()) < 2,
+    help="Search the HW 4 organization pages together with the syllabi (open HW 4 once to load them).",
+)
+campus_search = federation if search_orgs and len(federation.sources()) > 1 else None
+if campus_search is not None:
+    tools[0]["function"]["description"] += (
+        " It also searches the Syracuse student organization pages, so use it for questions about clubs too."
+    )
+
+if st.sidebar.button("Re-sync documents", help="Pick up added, changed or removed PDF files.",
+                     disabled=not hw5_store.progress.finished):
+    resync(hw5_store, st.session_state.openai_client)
+    st.rerun()
+
+diagnostics = diagnostics_toggle()
 
 
 # Lab 3 chat bot 
@@ -192,53 +271,139 @@ for msg in st.session_state.messages:
 # Chat Input
 
 if prompt := st.chat_input("Ask about course topics..."):
+    turn_start = time.perf_counter()
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
     
     client = st.session_state.openai_client
+    # Answers that drew on the organizations are cached apart. The mode is
+    # part of the entry's key: a version change would clear the shared
+    # cache for every session.
+    answer_mode = f"{model_to_use}+campus" if campus_search is not None else model_to_use
+    trace = start_trace("HW5.turn", enabled=diagnostics, model=model_to_use)
     apply_buffer()
-    
-
-    response = client.chat.completions.create(
-        model=model_to_use,
-        messages=st.session_state.messages,
-        tools=tools
-    )
-
-    message = response.choices[0].message
-
-    if message.tool_calls:
-        tool_call = message.tool_calls[0]
-        query_arg = eval(tool_call.function.arguments)["query"]
-
-        result = relevant_course_info(query_arg)
 
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": message.content,
-            "tool_calls": message.tool_calls
-        })
-        st.session_state.messages.append({
-            "role": "tool",
-            "tool_call_id": tool_call.id,
-            "content": result
-        })
-
-
-        final_response = client.chat.completions.create(
-                model=model_to_use,
-                messages=st.session_state.messages,
-                stream=True
+    # Near-duplicate questions whose prompt retrieves the same syllabi are
+    # replayed from the answer cache instead of running the tool loop. The
+    # prompt's sources come from the same hybrid retrieval as a search, so
+    # a course code BM25 is sure of costs no embedding; such prompts only
+    # match the same prompt exactly.
+    cached_answer = None
+    prompt_embedding = None
+    if use_answer_cache:
+        with trace.span("retrieve", purpose="answer_cache") as span:
+            prompt_results, prompt_retrieval = hybrid_query(
+                hw5_store.collection, hw5_store.lexical, prompt, lambda q: embed_text(client, q),
+                n_results=3, include=(),
             )
+            span["mode"] = prompt_retrieval['mode']
+        prompt_embedding = prompt_retrieval['embedding']
+        prompt_sources = prompt_results['ids'][0]
+        collection_version = manifest_fingerprint(HW5_MANIFEST)
+        cached_answer = answer_cache.lookup(
+            prompt_embedding, answer_mode, prompt_sources, collection_version,
+            threshold=answer_cache_threshold, prompt=prompt,
+        )
 
+    if cached_answer:
         with st.chat_message("assistant"):
-            response_text = st.write_stream(final_response)
-
+            response_text = st.write_stream(replay_stream(cached_answer))
     else:
-        response_text = message.content
-        with st.chat_message("assistant"):
-            st.markdown(response_text)
-   
+        input_tokens, requests = 0, 0
+        first_visible = None
+        with st.chat_message("assistant"), ThreadPoolExecutor(max_workers=TOOL_WORKERS) as pool:
+            # The model almost always searches for what the user asked, so
+            # that search starts while the first completion is in flight.
+            prefetched = None
+            if prefetch_retrieval:
+                prefetched = (query_key(prompt), pool.submit(
+                    course_info, hw5_store.collection, hw5_store.lexical, client, prompt,
+                    prompt_embedding, federation=campus_search,
+                ))
+
+            # Every round is streamed through the gateway (deadline,
+            # first-token budget and retries): text shows as it arrives, and
+            # each tool call's search starts as soon as its arguments have
+            # streamed in. After MAX_TOOL_ROUNDS the answer is requested
+            # without tools.
+            gateway = get_llm_gateway(st.secrets["OPENAI_API_KEY"])
+            response_text = None
+            for round_number in range(MAX_TOOL_ROUNDS):
+                round_tokens = count_message_tokens(st.session_state.messages)
+                input_tokens += round_tokens
+                requests += 1
+                searches = {}
+                # Searches started while the reply streams run BM25 right
+                # away; their embeddings go out in one request with the
+                # remaining calls' once the stream has ended.
+                batch = EmbeddingBatch(client)
+
+                def on_tool_call(call):
+                    query, error = tool_query(call)
+                    if error is None:
+                        searches[call.id] = search_for(query, pool, batch, prefetched)
+
+                round_stats = CallStats()
+                stream = ToolCallStream(gateway.stream_sync(
+                    st.session_state.messages, Route("openai", model_to_use), stats=round_stats,
+                    deltas=True, tools=tools,
+                ), on_tool_call)
+                with trace.span("llm.round", round=round_number, input_tokens=round_tokens) as span:
+                    try:
+                        text = st.write_stream(stream)
+                    except BaseException:
+                        # Don't leave early searches waiting on the pool's shutdown.
+                        batch.cancel()
+                        raise
+                    span["tool_calls"] = len(stream.tool_calls)
+                    span["attempts"] = round_stats.attempts
+                    if stream.first_text_at is not None:
+                        span["first_token_s"] = round(stream.first_text_at - stream.started_at, 3)
+                        if first_visible is None:
+                            first_visible = stream.first_text_at - turn_start
+                if not stream.tool_calls:
+                    response_text = text
+                    break
+
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": text or None,
+                    "tool_calls": [call.to_message() for call in stream.tool_calls],
+                })
+                st.session_state.messages.extend(
+                    run_tool_calls(stream.tool_calls, pool, batch, searches, prefetched, trace)
+                )
+
+            if response_text is None:
+                llm_stats = CallStats()
+                final_tokens = count_message_tokens(st.session_state.messages)
+                input_tokens += final_tokens
+                requests += 1
+                final_start = time.perf_counter()
+                response_text = st.write_stream(gateway.stream_sync(
+                    st.session_state.messages, Route("openai", model_to_use), stats=llm_stats,
+                ))
+                if first_visible is None and llm_stats.time_to_first_token is not None:
+                    first_visible = final_start - turn_start + llm_stats.time_to_first_token
+                record_llm_call(trace, llm_stats, response_text, input_tokens=final_tokens)
+
+            usage = f"Input: {input_tokens} tokens" + (f" over {requests} requests" if requests > 1 else "")
+            if first_visible is not None:
+                usage += f" · first token after {first_visible:.2f}s"
+            st.caption(usage)
+        trace.set(first_token_s=round(first_visible, 3) if first_visible is not None else None)
+
+        # Answers from a partial index aren't worth keeping.
+        if use_answer_cache and hw5_store.progress.finished:
+            answer_cache.store(prompt_embedding, answer_mode, prompt_sources, collection_version, response_text,
+                               prompt=prompt)
+
+    trace.set(answer_cache_hit=bool(cached_answer))
+    keep_trace("HW5", trace)
+
     st.session_state.messages.append({"role": "assistant", "content": response_text})
-    apply_buffer()
\ No newline at end of file
+    apply_buffer()
+
+
+show_diagnostics("HW5")
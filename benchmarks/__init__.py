@@ -0,0 +1 @@
+"""Offline benchmarks for the HW pages. Run modules with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,132 @@
+"""Compare the old fixed-count splitter with the token-bounded chunker.
+
+For every su_orgs page this builds chunks with each splitter, with and
+without the organization's name (the first extracted line) as a header on
+every chunk, so the header's effect isn't credited to the splitter. The
+chunks are embedded with the offline hashing embedder and searched with two
+query sets:
+
+* titles: "What is <org name>?" for every page (the name from its <title>),
+  which favours any chunk that repeats the name,
+* golden: the questions in ``benchmarks/golden/su_orgs.jsonl``, which
+  mostly describe what an organization does without naming it.
+
+A query is a hit when a chunk of its own page is among the top-k results.
+
+    python -m benchmarks.chunking [--folder HW4-Data/su_orgs] [--k 3]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.retrieval_suite import GOLDEN, load_golden
+from common.chunking import chunk_by_tokens
+from common.documents import HTML_OVERLAP_TOKENS, HTML_TARGET_TOKENS, chunk_text, extract_lines_from_html
+from common.tokens import count_tokens
+
+_TITLE = re.compile(r"<title>\s*(.*?)\s*-\s*'Cuse Activities\s*</title>", re.S)
+
+
+def page_title(html_path):
+    match = _TITLE.search(Path(html_path).read_text(encoding='utf-8', errors='ignore'))
+    return match.group(1).strip() if match else None
+
+
+def fixed_count_splitter(lines, name, header=False):
+    chunks = chunk_text(" ".join(lines), name, num_chunks=4)
+    if header and lines:
+        # The same "<header>: <text>" form chunk_by_tokens uses.
+        for chunk in chunks:
+            if not chunk['text'].startswith(lines[0]):
+                chunk['text'] = f"{lines[0]}: {chunk['text']}"
+    return chunks
+
+
+def token_splitter(lines, name, header=False, target_tokens=HTML_TARGET_TOKENS, overlap_tokens=HTML_OVERLAP_TOKENS):
+    return chunk_by_tokens(lines, name, target_tokens=target_tokens, overlap_tokens=overlap_tokens,
+                           header=lines[0] if header and lines else None)
+
+
+def hit_rates(embedder, matrix, sources, queries, k):
+    """(hit rate@1, hit rate@k) for queries, a list of (question, expected source)."""
+    scores = embedder.embed([question for question, _ in queries]) @ matrix.T
+    top = np.argsort(-scores, axis=1)[:, :k]
+    expected = np.array([source for _, source in queries])
+    hits_at_1 = np.mean(sources[top[:, 0]] == expected)
+    hits_at_k = np.mean([source in sources[row] for source, row in zip(expected, top)])
+    return round(float(hits_at_1), 3), round(float(hits_at_k), 3)
+
+
+def evaluate(pages, splitter, embedder, query_sets, k):
+    start = time.perf_counter()
+    texts, sources = [], []
+    for name, lines in pages.items():
+        for chunk in splitter(lines, name):
+            texts.append(chunk['text'])
+            sources.append(name)
+    chunk_seconds = time.perf_counter() - start
+
+    tokens = [count_tokens(text) for text in texts]
+    matrix = embedder.embed(texts)
+    sources = np.array(sources)
+    result = {
+        "chunks": len(texts),
+        "embedding_tokens": int(sum(tokens)),
+        "mean_tokens_per_chunk": round(float(np.mean(tokens)), 1),
+        "max_tokens_per_chunk": int(max(tokens)),
+        "chunk_seconds": round(chunk_seconds, 3),
+    }
+    for set_name, queries in query_sets.items():
+        hits_at_1, hits_at_k = hit_rates(embedder, matrix, sources, queries, k)
+        result[f"{set_name} hit_rate@1"] = hits_at_1
+        result[f"{set_name} hit_rate@{k}"] = hits_at_k
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default="HW4-Data/su_orgs")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--target-tokens", type=int, default=HTML_TARGET_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=HTML_OVERLAP_TOKENS)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    paths = sorted(Path(args.folder).glob("*.html"))
+    pages = {path.name: extract_lines_from_html(path) for path in paths}
+    query_sets = {
+        "titles": [(f"What is {title}?", path.name) for path in paths if (title := page_title(path))],
+        "golden": [(item["question"], item["source"]) for item in load_golden(GOLDEN / "su_orgs.jsonl")
+                   if item["source"] in pages],
+    }
+
+    embedder = HashingEmbedder()
+    tokens = f"chunk_by_tokens({args.target_tokens}, overlap={args.overlap_tokens})"
+    results = {}
+    for header in (False, True):
+        suffix = " + header" if header else ""
+        results[f"chunk_text(num_chunks=4){suffix}"] = evaluate(
+            pages, lambda lines, name: fixed_count_splitter(lines, name, header), embedder, query_sets, args.k,
+        )
+        results[f"{tokens}{suffix}"] = evaluate(
+            pages,
+            lambda lines, name: token_splitter(lines, name, header, args.target_tokens, args.overlap_tokens),
+            embedder, query_sets, args.k,
+        )
+
+    print(f"{len(pages)} pages, " + ", ".join(f"{len(q)} {name} queries" for name, q in query_sets.items()))
+    for name, result in results.items():
+        print(f"\n{name}")
+        for key, value in result.items():
+            print(f"  {key:>24}: {value}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Per-rerun latency of key validation with and without the client registry.
+
+Simulates a page rerun (validate the key, then get a client) against the
+local mock API. "before" builds a new OpenAI client and calls
+``models.list()`` on every rerun as the pages used to; "after" goes through
+``ClientRegistry``.
+
+    python -m benchmarks.client_registry [--reruns 50] [--latency 0.1]
+"""
+import argparse
+import statistics
+import time
+
+from openai import OpenAI
+
+from benchmarks.mock_openai import MockServer
+from common.clients import ClientRegistry
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def time_reruns(rerun, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        rerun()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1, help="mock API latency in seconds")
+    args = parser.parse_args()
+
+    with MockServer(latency=args.latency) as server:
+        def make_client(api_key):
+            return OpenAI(api_key=api_key, base_url=server.base_url)
+
+        def before():
+            client = make_client("sk-test")
+            client.models.list()
+
+        registry = ClientRegistry(openai_factory=lambda api_key: make_client(api_key))
+
+        def after():
+            registry.validate_openai("sk-test")
+            registry.openai("sk-test")
+
+        results = {"before": time_reruns(before, args.reruns), "after": time_reruns(after, args.reruns)}
+
+    for name, timings in results.items():
+        print(
+            f"{name:>6}: mean {statistics.mean(timings) * 1000:8.2f} ms  "
+            f"p50 {_percentile(timings, 0.5) * 1000:8.2f} ms  "
+            f"p95 {_percentile(timings, 0.95) * 1000:8.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Federated HW4 + HW5 retrieval against querying the collections one by one.
+
+Builds the HW4 and HW5 collections offline (hashing embedder, NumPy store)
+and runs passage queries lifted from random chunks of both corpora three
+ways:
+
+* single: ``hybrid_query`` on the corpus the passage came from only (an
+  oracle router; the latency floor a federated query should get close to),
+* sequential: ``hybrid_query`` on HW4, then on HW5, each embedding the query
+  itself (what two separate assistants cost for a cold query),
+* federated: ``FederatedSearch.search`` over both, one embedding, sources
+  searched concurrently, quota of one chunk per source.
+
+A query is a hit when a chunk of the passage's file is among the results.
+The embedding round trip is simulated with ``--embed-latency`` seconds.
+
+    python -m benchmarks.federated_search [--k 4] [--passages 200] [--embed-latency 0.15]
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.vector_store import load_corpus, percentile
+from common.federated import FederatedSearch
+from common.lexical import LexicalIndex, hybrid_query
+from common.vector_store import open_collection
+
+PASSAGE_WORDS = 12
+
+
+def build_store(tmp, corpus, chunks, embedder, backend):
+    collection = open_collection(tmp, corpus, backend)
+    embeddings = embedder.embed([chunk["text"] for chunk in chunks])
+    for i in range(0, len(chunks), 1000):
+        batch = chunks[i:i + 1000]
+        collection.upsert(ids=[c["id"] for c in batch], documents=[c["text"] for c in batch],
+                          embeddings=embeddings[i:i + 1000].tolist(),
+                          metadatas=[{"source": c["source"]} for c in batch])
+    return SimpleNamespace(collection=collection, lexical=LexicalIndex.from_collection(collection))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=4, help="results per query (per collection for sequential)")
+    parser.add_argument("--passages", type=int, default=200, help="queries per corpus")
+    parser.add_argument("--embed-latency", type=float, default=0.15)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dimensions=1536)
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        time.sleep(args.embed_latency)
+        return embedder.embed([text])[0].tolist()
+
+    rng = random.Random(0)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        stores, queries = {}, []
+        for corpus in ("HW4", "HW5"):
+            chunks = load_corpus(corpus)
+            stores[corpus] = build_store(tmp, corpus, chunks, embedder, args.backend)
+            for chunk in rng.sample(chunks, min(args.passages, len(chunks))):
+                words = chunk["text"].split()
+                start = rng.randrange(max(1, len(words) - PASSAGE_WORDS))
+                queries.append((corpus, " ".join(words[start:start + PASSAGE_WORDS]), chunk["source"]))
+
+        federation = FederatedSearch()
+        for corpus, store in stores.items():
+            federation.register(corpus, store, quota=1)
+
+        def single(corpus, text):
+            store = stores[corpus]
+            result, _ = hybrid_query(store.collection, store.lexical, text, embed, n_results=args.k,
+                                     include=("metadatas",))
+            return [meta["source"] for meta in result["metadatas"][0]]
+
+        def sequential(corpus, text):
+            sources = []
+            for store in stores.values():
+                result, _ = hybrid_query(store.collection, store.lexical, text, embed, n_results=args.k,
+                                         include=("metadatas",))
+                sources.extend(meta["source"] for meta in result["metadatas"][0])
+            return sources
+
+        def federated(corpus, text):
+            hits, _ = federation.search(text, embed, n_results=args.k)
+            return [hit.metadata["source"] for hit in hits]
+
+        for name, run in (("single", single), ("sequential", sequential), ("federated", federated)):
+            latencies, hits, returned = [], 0, 0
+            calls.clear()
+            for corpus, text, source in queries:
+                start = time.perf_counter()
+                sources = run(corpus, text)
+                latencies.append(time.perf_counter() - start)
+                hits += source in sources
+                returned += len(sources)
+            results[name] = {
+                "queries": len(queries),
+                "results_per_query": round(returned / len(queries), 1),
+                "hit_rate": round(hits / len(queries), 3),
+                "embeddings_per_query": round(len(calls) / len(queries), 2),
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            }
+
+    print(f"{len(queries)} passage queries over HW4 + HW5, embedding round trip {args.embed_latency * 1000:.0f} ms")
+    for name, r in results.items():
+        print(f"  {name:>10}: {r['results_per_query']:>4} results  hit rate {r['hit_rate']:.3f}  "
+              f"embeddings/query {r['embeddings_per_query']:.2f}  p50 {r['p50_ms']:>6} ms  p95 {r['p95_ms']:>6} ms")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark HTML-to-text backends over the su_orgs corpus.
+
+Reports files/s and the characters and embedding tokens each configuration
+extracts, relative to the original BeautifulSoup html.parser full-page path.
+
+    python -m benchmarks.html_extraction [--folder HW4-Data/su_orgs] [--repeat 1]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from common.html_text import available_backends, html_to_lines
+from common.tokens import count_tokens
+
+
+def run(htmls, backend, main_content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        texts = [" ".join(html_to_lines(html, backend, main_content)) for html in htmls]
+    seconds = time.perf_counter() - start
+    return {
+        "files_per_s": round(len(htmls) * repeat / seconds, 1),
+        "chars": sum(len(text) for text in texts),
+        "tokens": sum(count_tokens(text) for text in texts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default="HW4-Data/su_orgs")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    # Read files up front so disk I/O isn't part of the parse timing.
+    htmls = [path.read_text(encoding="utf-8") for path in sorted(Path(args.folder).glob("*.html"))]
+
+    configs = [("bs4", False)]
+    configs += [(backend, False) for backend in available_backends() if backend != "bs4"]
+    configs += [(backend, True) for backend in available_backends()]
+
+    results = {}
+    for backend, main_content in configs:
+        name = f"{backend}{' + main content' if main_content else ''}"
+        results[name] = run(htmls, backend, main_content, args.repeat)
+
+    baseline = results["bs4"]
+    print(f"{len(htmls)} files")
+    for name, result in results.items():
+        result["chars_vs_baseline"] = round(result["chars"] / baseline["chars"], 3)
+        result["tokens_vs_baseline"] = round(result["tokens"] / baseline["tokens"], 3)
+        result["speedup"] = round(result["files_per_s"] / baseline["files_per_s"], 1)
+        print(
+            f"  {name:>26}: {result['files_per_s']:>8} files/s ({result['speedup']}x)  "
+            f"{result['chars']:>9} chars ({result['chars_vs_baseline']:.0%})  "
+            f"{result['tokens']:>7} tokens ({result['tokens_vs_baseline']:.0%})"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Hybrid BM25 + vector retrieval against pure vector search.
+
+Builds the HW4 and HW5 collections offline (hashing embedder, NumPy store),
+then runs three kinds of queries through both paths:
+
+* names: "<org name>" / "What is <org name>?" for su_orgs pages,
+* codes: "IST 387" / "What is the grading policy for IST 387?" for syllabi,
+* passages: a dozen words lifted from a random chunk.
+
+A query is a hit when a chunk of the expected file is in the top k. The
+embedding round trip is simulated with ``--embed-latency`` seconds so the
+saving from skipped embedding calls shows up in the latency numbers.
+
+    python -m benchmarks.hybrid_retrieval [--k 3] [--embed-latency 0.15]
+"""
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.chunking import page_title
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.vector_store import load_corpus, percentile
+from common.lexical import LexicalIndex, hybrid_query
+from common.vector_store import open_collection
+
+_COURSE = re.compile(r"^(IST \d+)")
+PASSAGE_WORDS = 12
+
+
+def build_queries(corpus, chunks, rng, passages):
+    queries = []
+    if corpus == "HW4":
+        for path in sorted(Path("HW4-Data/su_orgs").glob("*.html")):
+            title = page_title(path)
+            if title:
+                queries.append(("name", title, path.name))
+                queries.append(("name", f"What is {title}?", path.name))
+    else:
+        for path in sorted(Path("HW-05-Data").glob("*.pdf")):
+            code = _COURSE.match(path.name).group(1)
+            queries.append(("code", code, path.name))
+            queries.append(("code", f"What is the grading policy for {code}?", path.name))
+    for chunk in rng.sample(chunks, min(passages, len(chunks))):
+        words = chunk["text"].split()
+        start = rng.randrange(max(1, len(words) - PASSAGE_WORDS))
+        queries.append(("passage", " ".join(words[start:start + PASSAGE_WORDS]), chunk["source"]))
+    return queries
+
+
+def run(collection, lexical, queries, embedder, k, embed_latency):
+    def embed(text):
+        time.sleep(embed_latency)
+        return embedder.embed([text])[0].tolist()
+
+    results = {}
+    for kind in sorted({kind for kind, _, _ in queries}):
+        subset = [q for q in queries if q[0] == kind]
+        for name, index in (("vector", None), ("hybrid", lexical)):
+            latencies, hits, skipped = [], 0, 0
+            for _, text, source in subset:
+                start = time.perf_counter()
+                result, info = hybrid_query(collection, index, text, embed, n_results=k, include=("metadatas",))
+                latencies.append(time.perf_counter() - start)
+                hits += any(meta["source"] == source for meta in result["metadatas"][0])
+                skipped += info["mode"] == "lexical"
+            results[f"{kind}/{name}"] = {
+                "queries": len(subset),
+                f"hit@{k}": round(hits / len(subset), 3),
+                "embed_skipped": round(skipped / len(subset), 3),
+                "mean_ms": round(float(np.mean(latencies)) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--passages", type=int, default=200)
+    parser.add_argument("--embed-latency", type=float, default=0.15)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dimensions=1536)
+    rng = random.Random(0)
+    all_results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for corpus in ("HW4", "HW5"):
+            chunks = load_corpus(corpus)
+            collection = open_collection(tmp, corpus, args.backend)
+            embeddings = embedder.embed([chunk["text"] for chunk in chunks])
+            for i in range(0, len(chunks), 1000):
+                batch = chunks[i:i + 1000]
+                collection.upsert(ids=[c["id"] for c in batch], documents=[c["text"] for c in batch],
+                                  embeddings=embeddings[i:i + 1000].tolist(),
+                                  metadatas=[{"source": c["source"]} for c in batch])
+            start = time.perf_counter()
+            lexical = LexicalIndex.from_collection(collection)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            queries = build_queries(corpus, chunks, rng, args.passages)
+            results = all_results[corpus] = run(collection, lexical, queries, embedder, args.k, args.embed_latency)
+            print(f"{corpus}: {len(chunks)} chunks, BM25 index built in {build_ms:.0f} ms, "
+                  f"embedding round trip {args.embed_latency * 1000:.0f} ms")
+            for name, r in results.items():
+                print(f"  {name:>16}: {r['queries']:>4} queries  hit@{args.k} {r[f'hit@{args.k}']:.3f}  "
+                      f"embedding skipped {r['embed_skipped']:.0%}  mean {r['mean_ms']} ms  p99 {r['p99_ms']} ms")
+    if args.json:
+        Path(args.json).write_text(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Tail latency of the LLM gateway against local mock providers.
+
+Two mock OpenAI-compatible servers stand in for a primary and a backup
+provider. The primary has a slow tail (``--slow-fraction`` of requests wait
+``--slow-latency`` seconds before the first byte) and occasional 500s.
+Each configuration sends the same number of concurrent streamed requests
+and reports time-to-first-token and end-to-end percentiles.
+
+    python -m benchmarks.llm_gateway [--requests 200] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from benchmarks.mock_openai import MockServer
+from common.llm_gateway import CallStats, LLMGateway, OpenAIProvider, Route
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_config(gateway, requests, concurrency, **call_kwargs):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    messages = [{"role": "user", "content": "Say something."}]
+
+    async def one():
+        async with semaphore:
+            stats = CallStats()
+            try:
+                async for _ in gateway.astream(messages, Route("primary", "mock-model"), stats=stats, **call_kwargs):
+                    pass
+                results.append(stats)
+            except Exception:
+                results.append(None)
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    ok = [stats for stats in results if stats is not None]
+    ttft = [stats.time_to_first_token for stats in ok]
+    total = [stats.total for stats in ok]
+    return {
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "hedged": sum(stats.hedged for stats in ok),
+        "ttft_p50_ms": round(percentile(ttft, 0.50) * 1000),
+        "ttft_p95_ms": round(percentile(ttft, 0.95) * 1000),
+        "ttft_p99_ms": round(percentile(ttft, 0.99) * 1000),
+        "total_p50_ms": round(percentile(total, 0.50) * 1000),
+        "total_p99_ms": round(percentile(total, 0.99) * 1000),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--fail-fraction", type=float, default=0.02)
+    parser.add_argument("--hedge-after", type=float, default=0.3)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    primary = MockServer(latency=args.latency, tokens_per_s=500, reply_tokens=50,
+                         slow_fraction=args.slow_fraction, slow_latency=args.slow_latency,
+                         fail_fraction=args.fail_fraction, seed=1).start()
+    backup = MockServer(latency=args.latency * 1.5, tokens_per_s=500, reply_tokens=50, seed=2).start()
+    try:
+        gateway = LLMGateway(
+            {"primary": OpenAIProvider("sk-mock", base_url=primary.base_url),
+             "backup": OpenAIProvider("sk-mock", base_url=backup.base_url)},
+            deadline=30, first_token_timeout=10, retries=2, backoff=0.1,
+        )
+        configs = {
+            "no retries": dict(),
+            "retries": dict(),
+            "retries + fallback": dict(fallback=Route("backup", "mock-model")),
+            f"retries + hedge@{args.hedge_after}s": dict(
+                fallback=Route("backup", "mock-model"), hedge_after=args.hedge_after),
+        }
+        results = {}
+        for name, kwargs in configs.items():
+            gateway.retries = 0 if name == "no retries" else 2
+            results[name] = asyncio.run(run_config(gateway, args.requests, args.concurrency, **kwargs))
+    finally:
+        primary.stop()
+        backup.stop()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.slow_fraction:.0%} slow ({args.slow_latency}s), {args.fail_fraction:.0%} failing")
+    for name, result in results.items():
+        print(
+            f"  {name:>24}: ok {result['ok']:>4}  failed {result['failed']:>3}  hedged {result['hedged']:>3}  "
+            f"TTFT p50/p95/p99 {result['ttft_p50_ms']}/{result['ttft_p95_ms']}/{result['ttft_p99_ms']} ms  "
+            f"total p50/p99 {result['total_p50_ms']}/{result['total_p99_ms']} ms"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
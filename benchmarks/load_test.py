@@ -0,0 +1,207 @@
+"""Load test: replay chat sessions against the pages with a mock provider.
+
+Each simulated user is a Streamlit ``AppTest`` session of one page
+(HW1-HW5) that runs a few turns: upload + question for HW1, URL summaries
+for HW2, chat messages for HW3-HW5. All sessions share one process, like
+the sessions of one Streamlit worker, and talk to a local mock
+OpenAI-compatible server (``benchmarks.mock_openai``) with configurable
+first-byte latency and token rate.
+
+For each concurrency level it reports sessions/s, turns/s, and percentiles
+of per-turn end-to-end latency (script rerun time) and time to first token
+(from the turn starting to the mock sending that turn's first chunk).
+
+The pages run in a scratch directory (with the corpora symlinked in) using
+the NumPy vector store, so the repository's stores and caches are not
+touched. One warm-up session per page runs first, and the background
+ingestion it starts is waited for, so ingestion isn't timed.
+
+    python -m benchmarks.load_test [--pages HW3 HW4] [--concurrency 1 2 4 8]
+        [--latency 0.3] [--tokens-per-s 50]
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.mock_openai import MockServer
+from benchmarks.vector_store import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ("HW1", "HW2", "HW3", "HW4", "HW5")
+QUESTIONS = {
+    "HW1": ["Give me a short summary.", "What is the main point?", "List three key facts."],
+    "HW3": ["What is photosynthesis?", "Why is the sky blue?", "How do volcanoes work?"],
+    "HW4": ["What does the Investment Club do?", "Is there a robotics club?", "How do I join the table tennis club?"],
+    "HW5": ["What is IST 387 about?", "Who teaches IST 488?", "What are the office hours for IST 314?"],
+}
+HW1_DOCUMENT = ("Meeting notes. The club met on Tuesday to plan the spring showcase. "
+                "Volunteers signed up for setup, tickets and cleanup. ") * 20
+
+
+class PageSession:
+    """Drives one AppTest session of a page, one turn at a time."""
+
+    def __init__(self, page, page_url, answer_cache, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.page = page
+        self.page_url = page_url
+        self.at = AppTest.from_file(str(ROOT / "HW" / f"{page}.py"), default_timeout=timeout)
+        self.at.secrets["OPENAI_API_KEY"] = "sk-mock"
+        self.at.run()
+        if page == "HW1":
+            self.at.text_input[0].input("sk-mock").run()
+            self.at.file_uploader[0].set_value(("notes.txt", HW1_DOCUMENT.encode(), "text/plain")).run()
+        if page in ("HW4", "HW5") and not answer_cache:
+            for checkbox in self.at.checkbox:
+                if checkbox.label.startswith("Reuse answers"):
+                    checkbox.uncheck()
+            self.at.run()
+        self._check()
+
+    def _check(self):
+        if self.at.exception:
+            raise RuntimeError(f"{self.page}: {self.at.exception[0].value}")
+
+    def turn(self, n, marker):
+        """Run one turn whose provider request will contain marker."""
+        if self.page == "HW2":
+            self.at.text_input[0].input(f"{self.page_url}?ref={marker}").run()
+            self.at.button[0].click().run()
+        elif self.page == "HW1":
+            question = QUESTIONS["HW1"][n % len(QUESTIONS["HW1"])]
+            self.at.text_area[0].input(f"{question} ({marker})").run()
+        else:
+            question = QUESTIONS[self.page][n % len(QUESTIONS[self.page])]
+            self.at.chat_input[0].set_value(f"{question} ({marker})").run()
+        self._check()
+
+
+def first_chunk_after(config, marker, since):
+    with config.lock:
+        times = [t for t, text in config.first_chunks if t >= since and marker in text]
+    return min(times) if times else None
+
+
+def run_level(mock, page_url, pages, concurrency, sessions, turns, answer_cache, timeout, level):
+    jobs = queue.Queue()
+    for i in range(sessions):
+        jobs.put((i, pages[i % len(pages)]))
+    turn_latencies, ttfts, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                i, page = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                session = PageSession(page, page_url, answer_cache, timeout)
+                for n in range(turns):
+                    marker = f"ref-{level}-{i}-{n}"
+                    start = time.perf_counter()
+                    session.turn(n, marker)
+                    end = time.perf_counter()
+                    first = first_chunk_after(mock.config, marker, start)
+                    with lock:
+                        turn_latencies.append(end - start)
+                        if first is not None:
+                            ttfts.append(first - start)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{page}: {e}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    def pcts(values):
+        if not values:
+            return {}
+        return {f"p{q}_ms": round(percentile(values, q / 100) * 1000) for q in (50, 95, 99)}
+
+    return {
+        "sessions": sessions,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "seconds": round(wall, 2),
+        "sessions_per_s": round((sessions - len(errors)) / wall, 2),
+        "turns_per_s": round(len(turn_latencies) / wall, 2),
+        "turn": pcts(turn_latencies),
+        "ttft": pcts(ttfts),
+        # Turns answered without a provider stream (e.g. answer cache replays).
+        "turns_without_stream": len(turn_latencies) - len(ttfts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=PAGES)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--sessions", type=int, default=None, help="sessions per level (default 2 x concurrency, min 5)")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock seconds before the first byte")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=60)
+    parser.add_argument("--answer-cache", action="store_true", help="leave HW4/HW5 answer caches on")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-rerun timeout in seconds")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    mock = MockServer(latency=args.latency, tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens).start()
+    page_url = mock.base_url.rsplit("/v1", 1)[0] + "/page"
+    os.environ["OPENAI_BASE_URL"] = mock.base_url
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    os.environ["VECTOR_STORE_BACKEND"] = "numpy"
+    sys.path.insert(0, str(ROOT))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for data in ("HW4-Data", "HW-05-Data"):
+            os.symlink(ROOT / data, Path(scratch) / data)
+        cwd = os.getcwd()
+        os.chdir(scratch)
+        try:
+            print(f"Warming up {', '.join(args.pages)} (ingestion, caches)...")
+            warm = run_level(mock, page_url, args.pages, 1, len(args.pages), 1, args.answer_cache, args.timeout, "warm")
+            # HW4/HW5 index in the background; let that finish first.
+            from common.ingest_worker import get_default_worker
+            get_default_worker().join()
+            if warm["errors"]:
+                print(f"  warm-up errors: {warm['error_samples']}")
+            for concurrency in args.concurrency:
+                sessions = args.sessions or max(5, 2 * concurrency)
+                r = results[concurrency] = run_level(mock, page_url, args.pages, concurrency, sessions,
+                                                     args.turns, args.answer_cache, args.timeout, concurrency)
+                print(
+                    f"  concurrency {concurrency:>3}: {r['sessions_per_s']:>6} sessions/s  "
+                    f"{r['turns_per_s']:>6} turns/s  "
+                    f"turn p50/p95/p99 {r['turn'].get('p50_ms')}/{r['turn'].get('p95_ms')}/{r['turn'].get('p99_ms')} ms  "
+                    f"TTFT p50/p95/p99 {r['ttft'].get('p50_ms')}/{r['ttft'].get('p95_ms')}/{r['ttft'].get('p99_ms')} ms  "
+                    f"no stream {r['turns_without_stream']}  errors {r['errors']}"
+                )
+                for sample in r["error_samples"]:
+                    print(f"    {sample}")
+        finally:
+            os.chdir(cwd)
+            mock.stop()
+
+    print(f"mock provider: {args.latency * 1000:.0f} ms to first byte, {args.tokens_per_s:.0f} tokens/s, "
+          f"{args.reply_tokens} tokens per reply; pages {', '.join(args.pages)}; {args.turns} turns per session")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
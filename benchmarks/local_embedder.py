@@ -0,0 +1,44 @@
+"""Deterministic, offline stand-in for the OpenAI embeddings endpoint.
+
+Texts are embedded with the hashing trick over word unigrams and bigrams,
+so benchmarks can rank chunks without network access or an API key. The
+absolute quality is lower than text-embedding-3-small, but it is stable
+across runs, which is what comparing two configurations needs.
+"""
+import re
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+        self.calls = 0
+        # Mimic ``client.embeddings.create`` so it can stand in for a client.
+        self.embeddings = self
+
+    def embed(self, texts):
+        """Return an (n, dimensions) float32 matrix of unit vectors."""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [a + " " + b for a, b in zip(words, words[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode())
+                matrix[row, h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def create(self, input, model=None, **kwargs):
+        self.calls += 1
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = self.embed(texts)
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=vector.tolist()) for i, vector in enumerate(vectors)
+        ])
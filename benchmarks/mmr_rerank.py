@@ -0,0 +1,124 @@
+"""MMR reranking under a token budget against plain top-k retrieval.
+
+Builds the HW4 and HW5 collections offline (hashing embedder, NumPy store)
+and runs the ``hybrid_retrieval`` query set (names, course codes and
+passages) through ``hybrid_query`` three ways:
+
+* top-k: the k best chunks, as the pages used to send them,
+* mmr: ``diversify`` over ``MMR_CANDIDATES`` candidates, same k, no budget,
+* mmr+budget: ``diversify`` with up to ``--budget-k`` chunks within the
+  page's context token budget.
+
+For each, the context the page would send is measured: tokens, distinct
+words (a proxy for how much different information it carries), redundancy
+(the mean of each chunk's highest cosine similarity to another chosen
+chunk), and whether a chunk of the expected file is still in it.
+
+    python -m benchmarks.mmr_rerank [--k 3] [--budget-k 4] [--passages 200]
+"""
+import argparse
+import json
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.hybrid_retrieval import build_queries
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.vector_store import load_corpus, percentile
+from common.lexical import LexicalIndex, hybrid_query
+from common.rerank import MMR_CANDIDATES, diversify
+from common.tokens import count_tokens
+from common.vector_store import open_collection
+
+# The pages' context budgets (HW4_CONTEXT_TOKENS, HW5_CONTEXT_TOKENS).
+BUDGETS = {"HW4": 240, "HW5": 512}
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def measure(collection, documents, ids):
+    if len(ids) > 1:
+        vectors = np.asarray(collection.get(ids=ids, include=["embeddings"])["embeddings"], dtype=np.float32)
+        similarity = vectors @ vectors.T
+        np.fill_diagonal(similarity, -1.0)
+        redundancy = float(similarity.max(axis=1).mean())
+    else:
+        redundancy = 0.0
+    words = {word for text in documents for word in _WORD.findall((text or "").lower())}
+    return sum(count_tokens(text) for text in documents), len(words), redundancy
+
+
+def run(collection, lexical, queries, embedder, k, budget_k, budget):
+    def embed(text):
+        return embedder.embed([text])[0].tolist()
+
+    configs = (("top-k", None, k, None), ("mmr", MMR_CANDIDATES, k, None),
+               ("mmr+budget", MMR_CANDIDATES, budget_k, budget))
+    results = {}
+    for name, candidates, n, token_budget in configs:
+        tokens, words, redundancy, hits, chunks, rerank_s = [], [], [], 0, 0, []
+        for _, text, source in queries:
+            result, _ = hybrid_query(collection, lexical, text, embed, n_results=candidates or n)
+            if candidates:
+                result, info = diversify(collection, result, n_results=n, token_budget=token_budget)
+                rerank_s.append(info["mmr_s"])
+            ids = result["ids"][0]
+            t, w, r = measure(collection, result["documents"][0], ids)
+            tokens.append(t)
+            words.append(w)
+            redundancy.append(r)
+            chunks += len(ids)
+            hits += any(meta["source"] == source for meta in result["metadatas"][0])
+        results[name] = {
+            "chunks": round(chunks / len(queries), 2),
+            "context_tokens": round(float(np.mean(tokens)), 1),
+            "distinct_words": round(float(np.mean(words)), 1),
+            "redundancy": round(float(np.mean(redundancy)), 3),
+            "hit_rate": round(hits / len(queries), 3),
+            "rerank_p50_ms": round(percentile(rerank_s, 0.50) * 1000, 2) if rerank_s else 0.0,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--budget-k", type=int, default=4, help="chunk limit for mmr+budget")
+    parser.add_argument("--passages", type=int, default=200)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dimensions=1536)
+    rng = random.Random(0)
+    all_results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for corpus in ("HW4", "HW5"):
+            chunks = load_corpus(corpus)
+            collection = open_collection(tmp, corpus, args.backend)
+            embeddings = embedder.embed([chunk["text"] for chunk in chunks])
+            for i in range(0, len(chunks), 1000):
+                batch = chunks[i:i + 1000]
+                collection.upsert(ids=[c["id"] for c in batch], documents=[c["text"] for c in batch],
+                                  embeddings=embeddings[i:i + 1000].tolist(),
+                                  metadatas=[{"source": c["source"]} for c in batch])
+            lexical = LexicalIndex.from_collection(collection)
+            queries = build_queries(corpus, chunks, rng, args.passages)
+            start = time.perf_counter()
+            results = all_results[corpus] = run(collection, lexical, queries, embedder, args.k,
+                                                args.budget_k, BUDGETS[corpus])
+            print(f"{corpus}: {len(queries)} queries, context budget {BUDGETS[corpus]} tokens "
+                  f"({time.perf_counter() - start:.1f} s)")
+            for name, r in results.items():
+                print(f"  {name:>10}: {r['chunks']:.2f} chunks  {r['context_tokens']:>6} tokens  "
+                      f"{r['distinct_words']:>6} distinct words  redundancy {r['redundancy']:.3f}  "
+                      f"hit rate {r['hit_rate']:.3f}  rerank p50 {r['rerank_p50_ms']} ms")
+    if args.json:
+        Path(args.json).write_text(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
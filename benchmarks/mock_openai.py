@@ -0,0 +1,290 @@
+"""Local OpenAI-compatible mock server for offline benchmarks.
+
+Implements just enough of the API for the pages: ``GET /v1/models``,
+``POST /v1/embeddings`` (hashing embedder) and ``POST /v1/chat/completions``
+with and without streaming. Requests that offer tools and end with a user
+message get a call to the first tool with that message as its ``query``
+(streamed as tool-call deltas when ``stream`` is set); ``tool_fraction``
+of them do, the rest get a plain answer.
+Latency before the first byte and the token rate while streaming are
+configurable, so benchmarks can model a provider. A fraction of requests
+can be made slow (a latency tail) or fail with 500.
+
+``GET /page?ref=...`` serves a small HTML article (echoing ``ref``) for the
+pages that fetch URLs. The time each stream's first chunk is sent is
+recorded in ``MockConfig.first_chunks`` for time-to-first-token numbers.
+
+    python -m benchmarks.mock_openai --port 8765 --latency 0.3 --tokens-per-s 80
+"""
+import argparse
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.local_embedder import HashingEmbedder
+
+DEFAULT_REPLY = (
+    "This is a mock answer from the local benchmark server. It streams a fixed "
+    "number of words at the configured rate so latency can be measured."
+)
+PAGE_PARAGRAPHS = [
+    "The local benchmark page describes a student organization that meets every week.",
+    "Members plan events, invite speakers and volunteer in the community during the semester.",
+    "New students can join at any time by emailing the club officers or attending a meeting.",
+] * 20
+
+
+class MockConfig:
+    def __init__(self, latency=0.2, tokens_per_s=50.0, reply=DEFAULT_REPLY, reply_tokens=None,
+                 slow_fraction=0.0, slow_latency=2.0, fail_fraction=0.0, tool_fraction=1.0, tool_calls=1,
+                 seed=None):
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.fail_fraction = fail_fraction
+        self.tool_fraction = tool_fraction
+        self.tool_calls = tool_calls
+        self.random = random.Random(seed)
+        self.reply = reply
+        self.reply_tokens = reply_tokens
+        self.embedder = HashingEmbedder()
+        self.requests = 0
+        # (perf_counter when the first chunk was sent, last user message)
+        self.first_chunks = []
+        self.lock = threading.Lock()
+
+    def first_byte_latency(self):
+        with self.lock:
+            slow = self.random.random() < self.slow_fraction
+        return self.slow_latency if slow else self.latency
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.fail_fraction
+
+    def should_call_tool(self):
+        with self.lock:
+            return self.random.random() < self.tool_fraction
+
+    def reply_words(self):
+        words = self.reply.split()
+        if self.reply_tokens:
+            words = (words * (self.reply_tokens // len(words) + 1))[:self.reply_tokens]
+        return words
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _count(self):
+        with self.config.lock:
+            self.config.requests += 1
+
+    def do_GET(self):
+        self._count()
+        url = urlparse(self.path)
+        if url.path == "/page":
+            return self._page(parse_qs(url.query).get("ref", [""])[0])
+        if self.path.rstrip("/").endswith("/models"):
+            time.sleep(self.config.latency)
+            return self._json({"object": "list", "data": [
+                {"id": "gpt-4o-mini", "object": "model", "created": 0, "owned_by": "mock"},
+            ]})
+        self._json({"error": {"message": "not found"}}, status=404)
+
+    def do_POST(self):
+        self._count()
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.endswith("/embeddings"):
+            return self._embeddings(request)
+        if self.path.endswith("/chat/completions"):
+            return self._chat(request)
+        self._json({"error": {"message": "not found"}}, status=404)
+
+    def _page(self, ref):
+        paragraphs = "".join(f"<p>{html.escape(p)}</p>" for p in PAGE_PARAGRAPHS)
+        body = (f"<html><head><title>Mock page {html.escape(ref)}</title></head><body>"
+                f"<main><h1>Mock page {html.escape(ref)}</h1>{paragraphs}</main></body></html>").encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _embeddings(self, request):
+        texts = request["input"]
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.config.latency / 4)
+        vectors = self.config.embedder.embed(texts)
+        self._json({
+            "object": "list",
+            "model": request.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": v.tolist()} for i, v in enumerate(vectors)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    def _chat(self, request):
+        try:
+            self._chat_response(request)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up on this request (e.g. a hedged loser).
+            pass
+
+    def _chat_response(self, request):
+        words = self.config.reply_words()
+        model = request.get("model", "mock")
+        messages = request.get("messages", [])
+        last_user = next((m.get("content") for m in reversed(messages) if m.get("role") == "user"), "")
+        time.sleep(self.config.first_byte_latency())
+        if self.config.should_fail():
+            return self._json({"error": {"message": "mock overloaded", "type": "server_error"}}, status=500)
+        tool_calls = None
+        if request.get("tools") and messages[-1].get("role") == "user" and self.config.should_call_tool():
+            tool = request["tools"][0]["function"]["name"]
+            tool_calls = [
+                {"id": f"call_{self.config.requests}_{i}", "type": "function", "function": {
+                    "name": tool, "arguments": json.dumps({"query": str(last_user) + (f" ({i + 1})" if i else "")}),
+                }}
+                for i in range(self.config.tool_calls)
+            ]
+        if tool_calls and not request.get("stream"):
+            # Same generation time as streaming the arguments (below).
+            pieces = sum(-(-len(call["function"]["arguments"]) // 4) for call in tool_calls)
+            time.sleep(pieces / self.config.tokens_per_s)
+            return self._json({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "tool_calls", "message": {
+                    "role": "assistant", "content": None, "tool_calls": tool_calls,
+                }}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        if not request.get("stream"):
+            time.sleep(len(words) / self.config.tokens_per_s)
+            return self._json({
+                "id": "mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": " ".join(words)}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(words), "total_tokens": len(words)},
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(payload):
+            data = f"data: {payload}\n\n".encode()
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        delay = 1.0 / self.config.tokens_per_s
+        if tool_calls:
+            # Arguments arrive a few characters (about a token) at a time.
+            for index, call in enumerate(tool_calls):
+                arguments = call["function"]["arguments"]
+                pieces = [arguments[i:i + 4] for i in range(0, len(arguments), 4)]
+                for n, piece in enumerate(pieces):
+                    part = {"index": index, "function": {"arguments": piece}}
+                    if n == 0:
+                        part.update(id=call["id"], type="function")
+                        part["function"]["name"] = call["function"]["name"]
+                    send(json.dumps({
+                        "id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+                        "choices": [{"index": 0, "delta": {"tool_calls": [part]}, "finish_reason": None}],
+                    }))
+                    time.sleep(delay)
+            words = []
+        for i, word in enumerate(words):
+            if i == 0:
+                with self.config.lock:
+                    self.config.first_chunks.append((time.perf_counter(), str(last_user)))
+            send(json.dumps({
+                "id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                             "finish_reason": None}],
+            }))
+            time.sleep(delay)
+        send(json.dumps({
+            "id": "mock", "object": "chat.completion.chunk", "created": 0, "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls" if tool_calls else "stop"}],
+        }))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockServer:
+    """Run the mock API on a background thread; usable as a context manager."""
+
+    def __init__(self, host="127.0.0.1", port=0, **config):
+        self.config = MockConfig(**config)
+        handler = type("Handler", (_Handler,), {"config": self.config})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first byte")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=None)
+    parser.add_argument("--slow-fraction", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--fail-fraction", type=float, default=0.0)
+    parser.add_argument("--tool-fraction", type=float, default=1.0, help="share of tool requests that call a tool")
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool calls per tool-calling reply")
+    args = parser.parse_args()
+
+    server = MockServer(args.host, args.port, latency=args.latency,
+                        tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens,
+                        slow_fraction=args.slow_fraction, slow_latency=args.slow_latency,
+                        fail_fraction=args.fail_fraction, tool_fraction=args.tool_fraction,
+                        tool_calls=args.tool_calls)
+    print(f"Mock OpenAI API on {server.base_url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Benchmark the PDF extraction backends over a folder of PDFs.
+
+Each backend runs in a fresh process so peak memory is measured in
+isolation. Reports pages/s, characters extracted, peak Python heap
+(tracemalloc) and the growth of peak RSS during extraction.
+
+The syllabi are all well under ``PARALLEL_MIN_PAGES``, so the folder's PDFs
+are also merged (repeated as needed) into one document of at least
+``--merged-pages`` pages, and every backend is run over both the folder
+and the merged document once per ``--workers`` value. With workers > 1 the
+merged document goes through the parallel path: page ranges on a spawned
+process pool, pool start-up included in the time.
+
+    python -m benchmarks.pdf_extraction [--folder HW-05-Data] [--repeat 5] [--workers 1 4]
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from common.pdf_text import BACKENDS, PARALLEL_MIN_PAGES, extract_pdf_pages
+
+
+def merge_pdfs(paths, min_pages, target):
+    """Write the PDFs at paths, repeated until min_pages, as one PDF at target."""
+    import pymupdf
+
+    with pymupdf.open() as merged:
+        while merged.page_count < min_pages:
+            for path in paths:
+                with pymupdf.open(path) as document:
+                    merged.insert_pdf(document)
+        merged.save(target)
+        return merged.page_count
+
+
+def _run_backend(backend, paths, repeat, workers, queue):
+    # Import the backend up front so its import cost isn't counted.
+    extract_pdf_pages(paths[0], backend)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pages = chars = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            extracted = extract_pdf_pages(path, backend, workers=workers)
+            pages += len(extracted)
+            chars += sum(len(text) for _, text in extracted)
+    seconds = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # tracemalloc slows pure-Python backends a lot, so measure the heap on a
+    # separate, untimed pass.
+    tracemalloc.start()
+    for path in paths:
+        extract_pdf_pages(path, backend, workers=workers)
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put({
+        "backend": backend,
+        "workers": workers,
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_s": round(pages / seconds, 1),
+        "chars_per_pass": chars // repeat,
+        "peak_python_heap_kb": peak_heap // 1024,
+        "peak_rss_growth_kb": rss_after - rss_before,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folder", default="HW-05-Data")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--merged-pages", type=int, default=4 * PARALLEL_MIN_PAGES)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    paths = [str(path) for path in sorted(Path(args.folder).glob("*.pdf"))]
+    if not paths:
+        raise SystemExit(f"No PDF files found in {args.folder}")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        merged = str(Path(tmp) / "merged.pdf")
+        merged_pages = merge_pdfs(paths, args.merged_pages, merged)
+        corpora = {"folder": paths, "merged": [merged]}
+        for corpus, corpus_paths in corpora.items():
+            runs = results[corpus] = []
+            for workers in args.workers:
+                for backend in BACKENDS:
+                    queue = ctx.Queue()
+                    process = ctx.Process(target=_run_backend,
+                                          args=(backend, corpus_paths, args.repeat, workers, queue))
+                    process.start()
+                    runs.append(queue.get())
+                    process.join()
+
+    for corpus, runs in results.items():
+        described = f"{len(paths)} PDFs" if corpus == "folder" else f"1 merged PDF of {merged_pages} pages"
+        print(f"{described} x {args.repeat} passes")
+        for result in runs:
+            print(
+                f"  {result['backend']:>8} workers={result['workers']}: {result['pages_per_s']:>8} pages/s  "
+                f"{result['chars_per_pass']:>8} chars  heap {result['peak_python_heap_kb']:>6} KB  "
+                f"rss +{result['peak_rss_growth_kb']} KB"
+            )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
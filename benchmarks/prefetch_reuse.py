@@ -0,0 +1,94 @@
+"""How often HW5's prefetched prompt search can answer the model's tool query.
+
+HW5 starts a course search for the user's prompt while the first completion
+is in flight, and a tool query reuses it when ``same_search`` says both
+would retrieve the same chunks. ``benchmarks/golden/tool_queries.jsonl``
+pairs each golden syllabus question with two tool queries as a model
+would phrase them (and the file the query is after). Builds the HW5
+collection offline (hashing embedder, NumPy store) and reports, per
+matching rule:
+
+* reuse rate: tool queries answered by the prefetch,
+* correct: reused prefetches that contain a chunk of the query's file
+  (against the same check for the query's own search),
+* false reuse: prompt / query pairs about different syllabi that would
+  share the prefetch, and how many of those miss the query's file.
+
+    python -m benchmarks.prefetch_reuse
+"""
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.vector_store import load_corpus
+from common.lexical import LexicalIndex, hybrid_query, same_search, search_key
+from common.rerank import MMR_CANDIDATES, diversify
+from common.vector_store import open_collection
+
+PAIRS = Path(__file__).parent / "golden" / "tool_queries.jsonl"
+# HW5_CONTEXT_CHUNKS and HW5_CONTEXT_TOKENS.
+CONTEXT_CHUNKS = 4
+CONTEXT_TOKENS = 512
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="numpy")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    pairs = [json.loads(line) for line in PAIRS.read_text().splitlines() if line.strip()]
+    embedder = HashingEmbedder(dimensions=1536)
+    with tempfile.TemporaryDirectory() as tmp:
+        chunks = load_corpus("HW5")
+        collection = open_collection(tmp, "HW5", args.backend)
+        embeddings = embedder.embed([chunk["text"] for chunk in chunks])
+        collection.upsert(ids=[c["id"] for c in chunks], documents=[c["text"] for c in chunks],
+                          embeddings=embeddings.tolist(), metadatas=[{"source": c["source"]} for c in chunks])
+        lexical = LexicalIndex.from_collection(collection)
+
+        sources = {}
+
+        def retrieved(query):
+            # The files course_info would send back for query.
+            if query not in sources:
+                result, _ = hybrid_query(collection, lexical, query, lambda q: embedder.embed([q])[0].tolist(),
+                                         n_results=MMR_CANDIDATES)
+                result, _ = diversify(collection, result, n_results=CONTEXT_CHUNKS, token_budget=CONTEXT_TOKENS)
+                sources[query] = {meta["source"] for meta in result["metadatas"][0]}
+            return sources[query]
+
+        rules = {
+            "same terms": lambda prompt, query: same_search(search_key(None, prompt), search_key(None, query)),
+            "same_search": lambda prompt, query: same_search(search_key(lexical, prompt),
+                                                             search_key(lexical, query)),
+        }
+        matching = [(p["prompt"], p["query"], p["source"]) for p in pairs]
+        crossed = [(a["prompt"], b["query"], b["source"]) for a in pairs for b in pairs if a["source"] != b["source"]]
+        own = sum(source in retrieved(query) for _, query, source in matching)
+
+        results = {}
+        for name, rule in rules.items():
+            reused = [(prompt, source) for prompt, query, source in matching if rule(prompt, query)]
+            false = [(prompt, source) for prompt, query, source in crossed if rule(prompt, query)]
+            results[name] = {
+                "reuse_rate": round(len(reused) / len(matching), 3),
+                "reused_correct": sum(source in retrieved(prompt) for prompt, source in reused),
+                "reused": len(reused),
+                "false_reuse": len(false),
+                "false_reuse_missing_file": sum(source not in retrieved(prompt) for prompt, source in false),
+            }
+
+    print(f"{len(matching)} tool queries ({own} find their file with their own search), "
+          f"{len(crossed)} cross-syllabus pairs")
+    for name, r in results.items():
+        print(f"  {name:>11}: reuse rate {r['reuse_rate']:.3f}  correct {r['reused_correct']}/{r['reused']}  "
+              f"false reuse {r['false_reuse']} ({r['false_reuse_missing_file']} missing the file)")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
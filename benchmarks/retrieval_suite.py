@@ -0,0 +1,185 @@
+"""Offline retrieval quality and latency suite over the bundled corpora.
+
+Every configuration ingests its corpus into a fresh NumPy vector store with
+the deterministic hashing embedder, then answers the golden questions in
+``benchmarks/golden/`` (one JSON object per line: ``question`` and the
+expected ``source`` file). Per configuration it reports:
+
+* ingestion time (extract + chunk + embed + write) and index size on disk,
+* chunk count and embedding tokens,
+* query latency p50/p95/p99 (embedding the question included), and
+* recall@k (the expected file is among the top k chunks' sources) and MRR.
+
+Configurations cover the extraction backends, the old fixed-count /
+whole-document splitters (for the organizations also on the token
+chunker's input, to compare splitters alone), the current token chunkers,
+and vector vs hybrid retrieval. Results are written as JSON; ``--compare`` prints the change
+against an earlier run.
+
+    python -m benchmarks.retrieval_suite [--k 1 3 5] [--json out.json] [--compare old.json]
+"""
+import argparse
+import json
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.local_embedder import HashingEmbedder
+from benchmarks.vector_store import percentile
+from common.documents import (
+    chunk_text, extract_lines_from_html, extract_text_from_pdf, parse_html_file, parse_pdf_file,
+)
+from common.lexical import LexicalIndex, hybrid_query
+from common.tokens import count_tokens
+from common.vector_store import open_collection
+
+GOLDEN = Path(__file__).parent / "golden"
+CORPORA = {
+    "su_orgs": (Path("HW4-Data/su_orgs"), "*.html", GOLDEN / "su_orgs.jsonl"),
+    "syllabi": (Path("HW-05-Data"), "*.pdf", GOLDEN / "syllabi.jsonl"),
+}
+DEFAULT_OUTPUT = Path(".cache/retrieval_suite.json")
+
+
+def html_fixed_count(path):
+    # The original HW4 ingestion: full-page BeautifulSoup text in 4 slices.
+    text = " ".join(extract_lines_from_html(path, backend="bs4", main_content=False))
+    return chunk_text(text, path.name, num_chunks=4)
+
+
+def html_fixed_count_header(path):
+    # The old splitter on the token chunker's input: main-content lines, the
+    # organization's name as a header on every chunk.
+    lines = extract_lines_from_html(path, backend="bs4")
+    chunks = chunk_text(" ".join(lines), path.name, num_chunks=4)
+    for chunk in chunks:
+        if lines and not chunk["text"].startswith(lines[0]):
+            chunk["text"] = f"{lines[0]}: {chunk['text']}"
+    return chunks
+
+
+def pdf_whole_document(path):
+    # The original HW5 ingestion: one document per syllabus.
+    return [{"text": extract_text_from_pdf(path), "id": path.name}]
+
+
+# name -> (corpus, parse function, retrieval)
+CONFIGS = {
+    "su_orgs/fixed-count-bs4": ("su_orgs", html_fixed_count, "vector"),
+    "su_orgs/fixed-count-bs4+header": ("su_orgs", html_fixed_count_header, "vector"),
+    "su_orgs/tokens-bs4": ("su_orgs", partial(parse_html_file, backend="bs4"), "vector"),
+    "su_orgs/tokens": ("su_orgs", parse_html_file, "vector"),
+    "su_orgs/tokens+hybrid": ("su_orgs", parse_html_file, "hybrid"),
+    "syllabi/whole-document": ("syllabi", pdf_whole_document, "vector"),
+    "syllabi/pages-pypdf2": ("syllabi", partial(parse_pdf_file, backend="pypdf2"), "vector"),
+    "syllabi/pages": ("syllabi", parse_pdf_file, "vector"),
+    "syllabi/pages+hybrid": ("syllabi", parse_pdf_file, "hybrid"),
+}
+
+
+def load_golden(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def directory_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def run_config(corpus, parse, retrieval, embedder, ks):
+    folder, pattern, golden_path = CORPORA[corpus]
+    golden = load_golden(golden_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        chunks = []
+        for path in sorted(folder.glob(pattern)):
+            for chunk in parse(path):
+                chunk["source"] = path.name
+                chunks.append(chunk)
+        collection = open_collection(tmp, "suite", "numpy")
+        embeddings = embedder.embed([chunk["text"] for chunk in chunks])
+        collection.upsert(
+            ids=[chunk["id"] for chunk in chunks],
+            documents=[chunk["text"] for chunk in chunks],
+            embeddings=embeddings,
+            metadatas=[{"source": chunk["source"]} for chunk in chunks],
+        )
+        collection.flush()
+        lexical = None
+        if retrieval == "hybrid":
+            lexical = LexicalIndex.from_collection(collection)
+            lexical.save(Path(tmp) / "suite.bm25.json")
+        ingest_seconds = time.perf_counter() - start
+        index_bytes = directory_size(tmp)
+
+        def embed(text):
+            return embedder.embed([text])[0]
+
+        n_results = max(ks)
+        latencies, ranks = [], []
+        for item in golden:
+            start = time.perf_counter()
+            result, _ = hybrid_query(collection, lexical, item["question"], embed,
+                                     n_results=n_results, include=("metadatas",))
+            latencies.append(time.perf_counter() - start)
+            sources = [meta["source"] for meta in result["metadatas"][0]]
+            ranks.append(sources.index(item["source"]) + 1 if item["source"] in sources else None)
+
+    report = {
+        "chunks": len(chunks),
+        "embedding_tokens": sum(count_tokens(chunk["text"]) for chunk in chunks),
+        "ingest_s": round(ingest_seconds, 3),
+        "index_kb": round(index_bytes / 1024, 1),
+        "questions": len(golden),
+        "query_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "query_p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "query_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+    for k in ks:
+        report[f"recall@{k}"] = round(float(np.mean([r is not None and r <= k for r in ranks])), 3)
+    report["mrr"] = round(float(np.mean([1.0 / r if r else 0.0 for r in ranks])), 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--only", nargs="+", choices=list(CONFIGS), help="run just these configurations")
+    parser.add_argument("--json", type=Path, default=DEFAULT_OUTPUT, help=f"results file (default {DEFAULT_OUTPUT})")
+    parser.add_argument("--compare", type=Path, help="an earlier results file to diff against")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    ks = sorted(set(args.k))
+    results = {}
+    for name in args.only or CONFIGS:
+        corpus, parse, retrieval = CONFIGS[name]
+        results[name] = run_config(corpus, parse, retrieval, embedder, ks)
+
+    previous = json.loads(args.compare.read_text()) if args.compare else {}
+    for name, r in results.items():
+        recalls = "  ".join(f"R@{k} {r[f'recall@{k}']:.3f}" for k in ks)
+        print(
+            f"{name:>30}: {r['chunks']:>5} chunks  {r['embedding_tokens']:>7} tok  "
+            f"ingest {r['ingest_s']:>6.2f}s  {r['index_kb']:>8} KB  "
+            f"p50/p95/p99 {r['query_p50_ms']}/{r['query_p95_ms']}/{r['query_p99_ms']} ms  "
+            f"{recalls}  MRR {r['mrr']:.3f}"
+        )
+        old = previous.get(name)
+        if old:
+            deltas = [f"{key} {r[key] - old[key]:+.3f}" for key in (*(f"recall@{k}" for k in ks), "mrr",
+                                                                   "query_p50_ms", "ingest_s")
+                      if key in old]
+            print(f"{'':>30}  vs {args.compare.name}: {'  '.join(deltas)}")
+
+    args.json.parent.mkdir(parents=True, exist_ok=True)
+    args.json.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Cold-start cost per page: import time and first-render latency.
+
+Each page is measured in a fresh Python process, like the first visitor
+after a server restart:
+
+* imports: time to import the modules the page imports at top level, and
+  which heavy libraries that pulls in,
+* first session: the first ``AppTest`` run of the page in the process,
+* second session: a new session of the same page in the same process,
+  which should reuse the process-wide clients and vector collections.
+
+Pages run in a scratch directory (corpora symlinked in) with the NumPy
+vector store and the mock provider, after one warm-up process has done the
+ingestion, so "first session" is opening existing stores, not building them.
+
+    python -m benchmarks.startup [--pages HW1 HW4] [--repeat 3]
+"""
+import argparse
+import ast
+import importlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ("HW1", "HW2", "HW3", "HW4", "HW5")
+HEAVY = ("numpy", "chromadb", "openai", "tiktoken", "requests", "bs4", "selectolax",
+         "pymupdf", "PyPDF2", "google.generativeai")
+
+
+def page_imports(page):
+    tree = ast.parse((ROOT / "HW" / f"{page}.py").read_text(encoding="utf-8"))
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return [m for m in modules if m != "streamlit"]
+
+
+def measure(page):
+    """Run in the child process; prints one JSON line."""
+    from streamlit.testing.v1 import AppTest
+
+    start = time.perf_counter()
+    for module in page_imports(page):
+        importlib.import_module(module)
+    imports = time.perf_counter() - start
+    heavy = [m for m in HEAVY if m in sys.modules]
+
+    sessions = []
+    for _ in range(2):
+        at = AppTest.from_file(str(ROOT / "HW" / f"{page}.py"), default_timeout=300)
+        at.secrets["OPENAI_API_KEY"] = "sk-mock"
+        start = time.perf_counter()
+        at.run()
+        sessions.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    print(json.dumps({"imports": imports, "heavy": heavy, "first": sessions[0], "second": sessions[1]}))
+
+
+def run_child(page, env, cwd):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", page],
+        env=env, cwd=cwd, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), choices=PAGES)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per page (medians are reported)")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock seconds before the first byte")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--child", choices=PAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return measure(args.child)
+
+    # Imported here so the child processes don't load numpy through it.
+    from benchmarks.mock_openai import MockServer
+
+    results = {}
+    with MockServer(latency=args.latency) as mock, tempfile.TemporaryDirectory() as scratch:
+        for data in ("HW4-Data", "HW-05-Data"):
+            os.symlink(ROOT / data, Path(scratch) / data)
+        env = dict(os.environ, OPENAI_BASE_URL=mock.base_url, VECTOR_STORE_BACKEND="numpy",
+                   NO_PROXY="127.0.0.1,localhost", no_proxy="127.0.0.1,localhost",
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+        for page in args.pages:
+            run_child(page, env, scratch)  # warm-up: ingestion and caches
+            runs = [run_child(page, env, scratch) for _ in range(args.repeat)]
+            results[page] = {
+                "imports_ms": round(statistics.median(r["imports"] for r in runs) * 1000),
+                "first_session_ms": round(statistics.median(r["first"] for r in runs) * 1000),
+                "second_session_ms": round(statistics.median(r["second"] for r in runs) * 1000),
+                "heavy_imports": runs[0]["heavy"],
+            }
+            r = results[page]
+            print(f"  {page}: imports {r['imports_ms']:>5} ms  first session {r['first_session_ms']:>5} ms  "
+                  f"second session {r['second_session_ms']:>5} ms  heavy: {', '.join(r['heavy_imports']) or '-'}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
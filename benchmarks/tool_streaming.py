@@ -0,0 +1,138 @@
+"""Time to first visible token: blocking vs streamed tool-choice completions.
+
+Replays the HW5 tool loop against the local mock provider two ways:
+
+* blocking: the first completion (with ``tools=``) is non-streaming; a
+  direct answer appears all at once, and a tool call is run only after the
+  whole response arrived, followed by a streamed answer (the old HW5 loop);
+* streamed: every round goes through ``ToolCallStream``; text shows as it
+  arrives and the search starts as soon as the call's arguments are in.
+
+Turns where the model answers directly and turns where it calls the search
+tool are measured separately. The search is simulated with
+``--search-latency`` seconds of work on a thread pool.
+
+    python -m benchmarks.tool_streaming [--turns 20] [--latency 0.3] [--tokens-per-s 50]
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.mock_openai import MockServer
+from benchmarks.vector_store import percentile
+from common.tool_stream import ToolCallStream
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "relevant_course_info",
+        "description": "Search the course syllabi.",
+        "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+    },
+}]
+
+
+def search(query, latency):
+    time.sleep(latency)
+    return f"Results for {query}"
+
+
+def blocking_turn(client, messages, pool, search_latency):
+    """Return (seconds to first visible text, total seconds) for the old loop."""
+    start = time.perf_counter()
+    response = client.chat.completions.create(model="gpt-4o", messages=messages, tools=TOOLS)
+    message = response.choices[0].message
+    if not message.tool_calls:
+        # The whole answer becomes visible at once.
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed
+    calls = message.tool_calls
+    futures = [pool.submit(search, json.loads(c.function.arguments)["query"], search_latency) for c in calls]
+    messages = messages + [{
+        "role": "assistant", "content": None,
+        "tool_calls": [{"id": c.id, "type": "function",
+                        "function": {"name": c.function.name, "arguments": c.function.arguments}} for c in calls],
+    }] + [{"role": "tool", "tool_call_id": c.id, "content": f.result()} for c, f in zip(calls, futures)]
+    first = None
+    for chunk in client.chat.completions.create(model="gpt-4o", messages=messages, stream=True):
+        if first is None and chunk.choices and chunk.choices[0].delta.content:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def streamed_turn(client, messages, pool, search_latency):
+    """Return (seconds to first visible text, total seconds) for ToolCallStream rounds."""
+    start = time.perf_counter()
+    first = None
+    for _ in range(3):
+        searches = {}
+
+        def on_tool_call(call):
+            searches[call.id] = pool.submit(search, json.loads(call.arguments)["query"], search_latency)
+
+        stream = ToolCallStream(
+            client.chat.completions.create(model="gpt-4o", messages=messages, tools=TOOLS, stream=True), on_tool_call
+        )
+        for _ in stream:
+            if first is None:
+                first = time.perf_counter() - start
+        if not stream.tool_calls:
+            break
+        for call in stream.tool_calls:
+            if call.id not in searches:
+                searches[call.id] = pool.submit(search, json.loads(call.arguments)["query"], search_latency)
+        messages = messages + [
+            {"role": "assistant", "content": stream.text or None,
+             "tool_calls": [call.to_message() for call in stream.tool_calls]},
+        ] + [{"role": "tool", "tool_call_id": call.id, "content": searches[call.id].result()}
+             for call in stream.tool_calls]
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="mock seconds before the first byte")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--tool-calls", type=int, default=1, help="tool calls per tool-calling reply")
+    parser.add_argument("--search-latency", type=float, default=0.15)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    from openai import OpenAI
+
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    results = {}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for kind, tool_fraction in (("direct", 0.0), ("tool", 1.0)):
+            with MockServer(latency=args.latency, tokens_per_s=args.tokens_per_s, reply_tokens=args.reply_tokens,
+                            tool_fraction=tool_fraction, tool_calls=args.tool_calls) as mock:
+                client = OpenAI(api_key="sk-mock", base_url=mock.base_url, max_retries=0)
+                for name, turn in (("blocking", blocking_turn), ("streamed", streamed_turn)):
+                    firsts, totals = [], []
+                    for n in range(args.turns):
+                        messages = [{"role": "user", "content": f"What is IST {300 + n} about?"}]
+                        first, total = turn(client, messages, pool, args.search_latency)
+                        firsts.append(first)
+                        totals.append(total)
+                    results[f"{kind}/{name}"] = {
+                        "first_token_p50_ms": round(percentile(firsts, 0.50) * 1000),
+                        "first_token_p95_ms": round(percentile(firsts, 0.95) * 1000),
+                        "total_p50_ms": round(percentile(totals, 0.50) * 1000),
+                    }
+
+    print(f"mock provider: {args.latency * 1000:.0f} ms to first byte, {args.tokens_per_s:.0f} tokens/s, "
+          f"{args.reply_tokens} tokens per reply; search {args.search_latency * 1000:.0f} ms")
+    for name, r in results.items():
+        print(f"  {name:>16}: first visible token p50 {r['first_token_p50_ms']:>5} ms  "
+              f"p95 {r['first_token_p95_ms']:>5} ms  total p50 {r['total_p50_ms']:>5} ms")
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
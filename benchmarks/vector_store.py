@@ -0,0 +1,155 @@
+"""Benchmark the vector store backends on the HW4 and HW5 corpora.
+
+Chunks are parsed the way the pages ingest them and embedded offline with
+the hashing embedder. Each backend runs in its own process and reports:
+
+* build time (upsert every chunk and persist),
+* open time and RSS growth after reopening the store from disk,
+* single-query latency p50/p99, and
+* recall@k against exact float32 brute-force search.
+
+Queries are the first words of randomly sampled chunks.
+
+    python -m benchmarks.vector_store [--queries 200] [--k 3] [--dimensions 1536]
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.local_embedder import HashingEmbedder
+from common.documents import parse_html_file, parse_pdf_file
+from common.vector_store import BACKENDS, open_collection
+
+QUERY_WORDS = 12
+UPSERT_BATCH = 1000
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_corpus(name):
+    if name == "HW4":
+        paths, parse = sorted(Path("HW4-Data/su_orgs").glob("*.html")), parse_html_file
+    else:
+        paths, parse = sorted(Path("HW-05-Data").glob("*.pdf")), parse_pdf_file
+    chunks = []
+    for path in paths:
+        for chunk in parse(path):
+            chunk["source"] = path.name
+            chunks.append(chunk)
+    return chunks
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_backend(backend, chunks, embeddings, queries, truth, k, results):
+    """Build, reopen and query one backend; runs in a child process."""
+    import_rss = rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        store = open_collection(tmp, "bench", backend)
+        for i in range(0, len(chunks), UPSERT_BATCH):
+            batch = chunks[i:i + UPSERT_BATCH]
+            store.upsert(
+                ids=[chunk["id"] for chunk in batch],
+                documents=[chunk["text"] for chunk in batch],
+                embeddings=embeddings[i:i + UPSERT_BATCH].tolist(),
+                metadatas=[{"source": chunk["source"]} for chunk in batch],
+            )
+        if hasattr(store, "flush"):
+            store.flush()
+        build = time.perf_counter() - start
+        del store
+
+        before_open = rss_mb()
+        start = time.perf_counter()
+        store = open_collection(tmp, "bench", backend)
+        store.count()
+        open_seconds = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            found = store.query(query_embeddings=[query.tolist()], n_results=k)["ids"][0]
+            latencies.append(time.perf_counter() - start)
+            hits += len(set(found) & expected)
+        results[backend] = {
+            "build_s": round(build, 2),
+            "open_ms": round(open_seconds * 1000, 1),
+            "query_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "query_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            f"recall@{k}": round(hits / (k * len(queries)), 3),
+            "rss_after_open_mb": round(rss_mb() - before_open, 1),
+            "rss_total_mb": round(rss_mb() - import_rss, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", choices=("HW4", "HW5", "both"), default="both")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dimensions", type=int, default=1536, help="1536 matches text-embedding-3-small")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    embedder = HashingEmbedder(dimensions=args.dimensions)
+    rng = random.Random(0)
+    all_results = {}
+    for corpus in (("HW4", "HW5") if args.corpus == "both" else (args.corpus,)):
+        chunks = load_corpus(corpus)
+        embeddings = embedder.embed([chunk["text"] for chunk in chunks]).astype(np.float32)
+        sample = rng.sample(chunks, min(args.queries, len(chunks)))
+        queries = embedder.embed([" ".join(chunk["text"].split()[:QUERY_WORDS]) for chunk in sample])
+        # Ground truth: exact top-k by cosine similarity.
+        scores = queries @ embeddings.T
+        truth = [{chunks[i]["id"] for i in np.argsort(-row)[:args.k]} for row in scores]
+
+        ctx = multiprocessing.get_context("spawn")
+        manager = ctx.Manager()
+        results = manager.dict()
+        for backend in args.backends:
+            proc = ctx.Process(target=run_backend,
+                               args=(backend, chunks, embeddings, queries, truth, args.k, results))
+            proc.start()
+            proc.join()
+        all_results[corpus] = dict(results)
+        manager.shutdown()
+
+        print(f"{corpus}: {len(chunks)} chunks x {args.dimensions} dims, {len(queries)} queries, k={args.k}")
+        for backend in args.backends:
+            if backend not in all_results[corpus]:
+                print(f"  {backend:>11}: failed")
+                continue
+            r = all_results[corpus][backend]
+            print(
+                f"  {backend:>11}: build {r['build_s']:>6}s  open {r['open_ms']:>7} ms  "
+                f"query p50/p99 {r['query_p50_ms']}/{r['query_p99_ms']} ms  "
+                f"recall@{args.k} {r[f'recall@{args.k}']:.3f}  "
+                f"RSS +{r['rss_after_open_mb']} MB after open ({r['rss_total_mb']} MB total)"
+            )
+    if args.json:
+        Path(args.json).write_text(json.dumps(all_results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Helpers shared by the HW pages (ingestion, embeddings, retrieval)."""
@@ -0,0 +1,166 @@
+"""Semantic cache of chat answers for near-duplicate questions.
+
+An entry is reused when a new prompt's embedding is within ``threshold``
+cosine similarity of a cached prompt *and* it was answered by the same model
+from the same retrieved sources of the same collection version. Entries
+expire after ``ttl`` seconds and are dropped when the collection changes.
+
+Prompts retrieved by BM25 alone have no embedding (computing one just for
+the cache would cost the round trip BM25 saved), so every entry is also
+keyed on the normalized prompt text, and such prompts match exactly.
+"""
+import threading
+import time
+
+import numpy as np
+
+from common.lexical import tokenize
+
+DEFAULT_THRESHOLD = 0.92
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 2000
+
+
+class AnswerCache:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = []
+        self._matrix = None
+        # (normalized prompt, model, sources) -> entry
+        self._exact = {}
+        self._collection_version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _key(prompt, model, sources):
+        return " ".join(tokenize(prompt)), model, sources
+
+    def _check_version(self, collection_version):
+        if collection_version != self._collection_version:
+            self._entries = []
+            self._matrix = None
+            self._exact = {}
+            self._collection_version = collection_version
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        if self._entries and self._entries[0]["created"] < cutoff:
+            self._entries = [entry for entry in self._entries if entry["created"] >= cutoff]
+            self._matrix = None
+        if self._exact and next(iter(self._exact.values()))["created"] < cutoff:
+            self._exact = {key: entry for key, entry in self._exact.items() if entry["created"] >= cutoff}
+
+    def lookup(self, embedding, model, source_ids, collection_version, threshold=None, prompt=None):
+        """Return the cached answer for a similar prompt, or None.
+
+        embedding may be None (BM25-only retrieval); then only an exact
+        match on the normalized prompt counts.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        sources = tuple(source_ids)
+        with self._lock:
+            self._check_version(collection_version)
+            self._expire()
+            exact = self._exact.get(self._key(prompt, model, sources)) if prompt is not None else None
+            if exact is not None:
+                self.hits += 1
+                return exact["answer"]
+            if embedding is None or not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix = np.stack([entry["vector"] for entry in self._entries])
+            scores = self._matrix @ self._normalize(embedding)
+            for i in np.argsort(-scores):
+                if scores[i] < threshold:
+                    break
+                entry = self._entries[i]
+                if entry["model"] == model and entry["sources"] == sources:
+                    self.hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, model, source_ids, collection_version, answer, prompt=None):
+        if not answer:
+            return
+        sources = tuple(source_ids)
+        with self._lock:
+            self._check_version(collection_version)
+            if prompt is not None:
+                key = self._key(prompt, model, sources)
+                self._exact.pop(key, None)
+                self._exact[key] = {"answer": answer, "created": time.time()}
+                if len(self._exact) > self.max_entries:
+                    self._exact.pop(next(iter(self._exact)))
+            if embedding is None:
+                return
+            self._entries.append({
+                "vector": self._normalize(embedding),
+                "model": model,
+                "sources": sources,
+                "answer": answer,
+                "created": time.time(),
+            })
+            if len(self._entries) > self.max_entries:
+                self._entries = self._entries[-self.max_entries:]
+            self._matrix = None
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": max(len(self._entries), len(self._exact))}
+
+
+def replay_stream(text, chunk_words=3, delay=0.0):
+    """Yield a cached answer in small pieces so it renders like a live stream."""
+    words = text.split(" ")
+    for i in range(0, len(words), chunk_words):
+        piece = " ".join(words[i:i + chunk_words])
+        yield piece if i + chunk_words >= len(words) else piece + " "
+        if delay:
+            time.sleep(delay)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(name):
+    """Process-wide answer cache per assistant, shared across sessions."""
+    with _caches_lock:
+        if name not in _caches:
+            _caches[name] = AnswerCache()
+        return _caches[name]
+
+
+def answer_cache_sidebar(name):
+    """Page UI: the answer cache controls and the cache hit counters.
+
+    Returns ``(cache, enabled, threshold)`` for the page's assistant.
+    """
+    import streamlit as st
+    from common.embed_cache import get_default_cache
+
+    enabled = st.sidebar.checkbox("Reuse answers to similar questions", value=True)
+    threshold = st.sidebar.slider(
+        "Answer cache similarity", 0.80, 1.00, DEFAULT_THRESHOLD, 0.01, disabled=not enabled
+    )
+
+    cache_stats = get_default_cache().stats()
+    st.sidebar.caption(
+        f"Embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['entries']} entries)"
+    )
+    cache = get_answer_cache(name)
+    answer_stats = cache.stats()
+    st.sidebar.caption(f"Answer cache: {answer_stats['hits']} hits / {answer_stats['misses']} misses")
+    return cache, enabled, threshold
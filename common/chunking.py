@@ -0,0 +1,104 @@
+"""Token-bounded, structure-aware chunking.
+
+Text is consumed line by line (so extractors can stream it in), split into
+sentences, and packed into chunks of about ``target_tokens`` tokens. Chunks
+break at sentence boundaries, prefer to start at headings, and repeat the
+last ``overlap_tokens`` worth of sentences from the previous chunk.
+"""
+import re
+
+from common.tokens import count_tokens
+
+DEFAULT_TARGET_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 40
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["“(\[]?[A-Z0-9])')
+
+
+def split_sentences(text):
+    """Split a line of text into sentences."""
+    return [part.strip() for part in _SENTENCE_END.split(text) if part.strip()]
+
+
+def looks_like_heading(line):
+    """Short lines without closing punctuation are treated as headings."""
+    words = line.split()
+    return 0 < len(words) <= 8 and line[-1] not in '.!?,;:' and not line.islower()
+
+
+def _units(lines):
+    """Yield (sentence, tokens, is_heading) for every sentence in lines."""
+    for line in lines:
+        line = " ".join(line.split())
+        if not line:
+            continue
+        heading = looks_like_heading(line)
+        for sentence in split_sentences(line):
+            yield sentence, count_tokens(sentence), heading
+            heading = False
+
+
+def _split_long(sentence, target_tokens):
+    """Hard-split a single sentence that is longer than a whole chunk."""
+    words = sentence.split()
+    # Tokens per word varies, so size pieces from this sentence's own ratio.
+    per_piece = max(1, int(len(words) * target_tokens / max(1, count_tokens(sentence))))
+    for i in range(0, len(words), per_piece):
+        piece = " ".join(words[i:i + per_piece])
+        yield piece, count_tokens(piece), False
+
+
+def iter_chunks(lines, target_tokens=DEFAULT_TARGET_TOKENS, overlap_tokens=DEFAULT_OVERLAP_TOKENS):
+    """Yield chunk strings from an iterable of text lines."""
+    current, current_tokens = [], 0
+    # A heading may start a new chunk once the current one is half full.
+    min_tokens_before_heading = target_tokens // 2
+
+    def units():
+        for sentence, tokens, heading in _units(lines):
+            if tokens > target_tokens:
+                yield from _split_long(sentence, target_tokens)
+            else:
+                yield sentence, tokens, heading
+
+    for sentence, tokens, heading in units():
+        full = current_tokens + tokens > target_tokens
+        at_heading = heading and current_tokens >= min_tokens_before_heading
+        if current and (full or at_heading):
+            yield " ".join(text for text, _ in current)
+            if at_heading:
+                # Don't carry the previous section into a new one.
+                current, current_tokens = [], 0
+            else:
+                tail, tail_tokens = [], 0
+                for text, n in reversed(current):
+                    if tail_tokens + n > overlap_tokens:
+                        break
+                    tail.insert(0, (text, n))
+                    tail_tokens += n
+                if tail_tokens + tokens > target_tokens:
+                    tail, tail_tokens = [], 0
+                current, current_tokens = tail, tail_tokens
+        current.append((sentence, tokens))
+        current_tokens += tokens
+
+    if current:
+        yield " ".join(text for text, _ in current)
+
+
+def chunk_by_tokens(text, file_name, target_tokens=DEFAULT_TARGET_TOKENS,
+                    overlap_tokens=DEFAULT_OVERLAP_TOKENS, header=None):
+    """Chunk text into ``{'text', 'id'}`` dicts, the same shape as chunk_text.
+
+    If header is given (e.g. the page title) it is prepended to every chunk
+    after the first, so each chunk still says which document it is from.
+    """
+    lines = text.splitlines() if isinstance(text, str) else text
+    if header:
+        target_tokens = max(1, target_tokens - count_tokens(header))
+    chunks = []
+    for i, chunk in enumerate(iter_chunks(lines, target_tokens, overlap_tokens)):
+        if header and not chunk.startswith(header):
+            chunk = f"{header}: {chunk}"
+        chunks.append({'text': chunk, 'id': f"{file_name}_chunk_{i+1}"})
+    return chunks
@@ -0,0 +1,115 @@
+"""Process-wide API clients shared by every page and session.
+
+Clients are created once per API key (keyed by a hash of the key, never
+the key itself) and reused, so their HTTP connection pools survive reruns.
+Key validation results are memoized for a while so a rerun doesn't pay
+for a ``models.list()`` round trip.
+"""
+import hashlib
+import threading
+import time
+
+import streamlit as st
+
+VALIDATION_TTL = 10 * 60
+
+
+def key_hash(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class ClientRegistry:
+    def __init__(self, validation_ttl=VALIDATION_TTL, openai_factory=None):
+        self.validation_ttl = validation_ttl
+        self._openai_factory = openai_factory
+        self._openai = {}
+        self._gemini = {}
+        self._validations = {}
+        self._gateways = {}
+        self._gemini_key = None
+        self._lock = threading.Lock()
+
+    def openai(self, api_key):
+        """Return the shared OpenAI client for api_key."""
+        digest = key_hash(api_key)
+        with self._lock:
+            client = self._openai.get(digest)
+            if client is None:
+                if self._openai_factory is None:
+                    from openai import OpenAI
+                    self._openai_factory = OpenAI
+                client = self._openai[digest] = self._openai_factory(api_key=api_key)
+            return client
+
+    def validate_openai(self, api_key):
+        """Return (is_valid, message), calling the API at most once per TTL.
+
+        Only definite answers are memoized; transient errors are retried on
+        the next rerun.
+        """
+        from openai import AuthenticationError
+
+        digest = key_hash(api_key)
+        now = time.monotonic()
+        cached = self._validations.get(digest)
+        if cached and cached[0] > now:
+            return cached[1]
+        try:
+            self.openai(api_key).models.list()
+            result = (True, "API key is valid")
+        except AuthenticationError:
+            result = (False, "Invalid API key")
+        except Exception as e:
+            return False, f"Error validating API key: {str(e)}"
+        self._validations[digest] = (now + self.validation_ttl, result)
+        return result
+
+    def gemini(self, api_key, model_name):
+        """Return a shared GenerativeModel, configuring the SDK only on key change."""
+        import google.generativeai as genai
+
+        digest = key_hash(api_key)
+        with self._lock:
+            if self._gemini_key != digest:
+                # genai.configure is process-global, so models built for
+                # another key are stale.
+                genai.configure(api_key=api_key)
+                self._gemini_key = digest
+                self._gemini.clear()
+            model = self._gemini.get(model_name)
+            if model is None:
+                model = self._gemini[model_name] = genai.GenerativeModel(model_name)
+            return model
+
+    def gateway(self, openai_key=None, gemini_key=None):
+        """Return the shared LLM gateway for this pair of keys."""
+        from common.llm_gateway import GeminiProvider, LLMGateway, OpenAIProvider
+
+        digest = (openai_key and key_hash(openai_key), gemini_key and key_hash(gemini_key))
+        with self._lock:
+            gateway = self._gateways.get(digest)
+            if gateway is None:
+                gateway = LLMGateway()
+                if openai_key:
+                    gateway.register("openai", OpenAIProvider(openai_key))
+                if gemini_key:
+                    gateway.register("gemini", GeminiProvider(gemini_key, self.gemini))
+                self._gateways[digest] = gateway
+            return gateway
+
+
+@st.cache_resource
+def get_registry():
+    return ClientRegistry()
+
+
+def get_openai_client(api_key):
+    return get_registry().openai(api_key)
+
+
+def validate_openai_key(api_key):
+    return get_registry().validate_openai(api_key)
+
+
+def get_llm_gateway(openai_key=None, gemini_key=None):
+    return get_registry().gateway(openai_key, gemini_key)
@@ -0,0 +1,142 @@
+"""Token-budgeted chat history with a rolling summary of evicted turns.
+
+``ContextWindow.fit`` replaces the old "keep the last N messages" buffers.
+The leading system prompt is always kept. Everything after it is trimmed
+by token count, a whole turn (a user message and the replies and tool
+results that follow it) at a time, so tool results are never orphaned.
+
+Evicted turns are folded into a single summary message that sits right
+after the system prompt. Trimming has hysteresis: nothing changes until the
+history passes ``max_tokens``, and then it is cut down to ``low_water``.
+Between evictions every request therefore starts with the same bytes
+(system prompt, summary, older turns), which is what provider-side prompt
+caching keys on.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+from common.tokens import count_tokens
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+# Role, separators and reply priming that every chat message costs.
+MESSAGE_OVERHEAD_TOKENS = 4
+DEFAULT_MAX_TOKENS = 4000
+DEFAULT_SUMMARY_TOKENS = 400
+SUMMARY_LINE_WORDS = 30
+
+
+@lru_cache(maxsize=4096)
+def _text_tokens(text):
+    return count_tokens(text)
+
+
+def _tool_call_text(tool_call):
+    function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+    if isinstance(function, dict):
+        return f"{function.get('name', '')} {function.get('arguments', '')}"
+    return f"{function.name} {function.arguments}"
+
+
+def message_tokens(message):
+    """Approximate prompt tokens for one chat message."""
+    tokens = MESSAGE_OVERHEAD_TOKENS
+    content = message.get("content")
+    if isinstance(content, str):
+        tokens += _text_tokens(content)
+    for tool_call in message.get("tool_calls") or ():
+        tokens += _text_tokens(_tool_call_text(tool_call))
+    return tokens
+
+
+def count_message_tokens(messages):
+    """Approximate input tokens for a whole request."""
+    return sum(message_tokens(m) for m in messages) + 3
+
+
+def is_summary(message):
+    return message["role"] == "system" and str(message.get("content", "")).startswith(SUMMARY_PREFIX)
+
+
+def _split_turns(messages):
+    """Group messages into turns, each starting at a user message.
+
+    System messages right before a user message (per-turn retrieval
+    context) belong to that user's turn.
+    """
+    turns = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            carried = []
+            while turns and turns[-1] and turns[-1][-1]["role"] == "system":
+                carried.insert(0, turns[-1].pop())
+            turns = [turn for turn in turns if turn]
+            turns.append(carried)
+        turns[-1].append(message)
+    return turns
+
+
+def summarize_turns(previous, turns, max_tokens=DEFAULT_SUMMARY_TOKENS):
+    """Fold turns into the previous summary text, extractively.
+
+    Each user or assistant message becomes one shortened line; the oldest
+    lines are dropped once the summary exceeds max_tokens.
+    """
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        for message in turn:
+            content = message.get("content")
+            if message["role"] not in ("user", "assistant") or not isinstance(content, str) or not content.strip():
+                continue
+            words = content.split()
+            text = " ".join(words[:SUMMARY_LINE_WORDS]) + (" ..." if len(words) > SUMMARY_LINE_WORDS else "")
+            lines.append(f"- {message['role']}: {text}")
+    while len(lines) > 1 and _text_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+@dataclass
+class ContextWindow:
+    max_tokens: int = DEFAULT_MAX_TOKENS
+    low_water: float = 0.6
+    summary_tokens: int = DEFAULT_SUMMARY_TOKENS
+    summarizer: object = summarize_turns
+
+    def fit(self, messages):
+        """Return messages trimmed to the budget, with evicted turns summarized.
+
+        The budget covers everything after the leading system messages,
+        the summary included; the latest turn is always kept even if it
+        alone is over budget. Messages before the first user message (the
+        page's greeting) are evicted without being summarized.
+        """
+        pinned_end = 0
+        while pinned_end < len(messages) and messages[pinned_end]["role"] == "system" \
+                and not is_summary(messages[pinned_end]):
+            pinned_end += 1
+        pinned = messages[:pinned_end]
+        rest = messages[pinned_end:]
+
+        if count_message_tokens(rest) <= self.max_tokens:
+            return list(messages)
+
+        summary = ""
+        if rest and is_summary(rest[0]):
+            summary = rest[0]["content"][len(SUMMARY_PREFIX):].strip()
+            rest = rest[1:]
+
+        turns = _split_turns(rest)
+        # Leave room for the summary message the evicted turns end up in.
+        reserve = message_tokens({"role": "system", "content": SUMMARY_PREFIX}) + self.summary_tokens
+        target = int(self.max_tokens * self.low_water) - reserve
+        kept_tokens = count_message_tokens(rest)
+        evicted = []
+        while len(turns) > 1 and kept_tokens > target:
+            turn = turns.pop(0)
+            kept_tokens -= sum(message_tokens(m) for m in turn)
+            if any(m["role"] == "user" for m in turn):
+                evicted.append(turn)
+
+        summary = self.summarizer(summary, evicted, self.summary_tokens)
+        summary_message = [{"role": "system", "content": f"{SUMMARY_PREFIX}\n{summary}"}] if summary else []
+        return pinned + summary_message + [m for turn in turns for m in turn]
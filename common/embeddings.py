@@ -0,0 +1,98 @@
+"""Embedding calls shared by the HW4/HW5 collections and chat loops.
+
+Every call goes through the persistent embedding cache first, so rebuilding
+a collection or asking the same question again costs no API round trip.
+"""
+import threading
+from concurrent.futures import Future
+
+from common.embed_cache import get_default_cache
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+_DEFAULT = object()
+
+
+def embed_texts(client, texts, model=EMBEDDING_MODEL, dimensions=None, cache=_DEFAULT):
+    """Embed a list of texts and return vectors in input order.
+
+    Pass ``cache=None`` to bypass the on-disk cache.
+    """
+    if not texts:
+        return []
+    if cache is _DEFAULT:
+        cache = get_default_cache()
+
+    vectors = cache.get_many(model, dimensions, texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        # Identical texts in one request are only sent once.
+        unique = list(dict.fromkeys(texts[i] for i in missing))
+        kwargs = {"dimensions": dimensions} if dimensions else {}
+        response = client.embeddings.create(input=unique, model=model, **kwargs)
+        data = sorted(response.data, key=lambda item: item.index)
+        fresh = dict(zip(unique, (item.embedding for item in data)))
+        for i in missing:
+            vectors[i] = fresh[texts[i]]
+        if cache is not None:
+            cache.put_many(model, dimensions, unique, [fresh[text] for text in unique])
+    return vectors
+
+
+def embed_text(client, text, model=EMBEDDING_MODEL, dimensions=None, cache=_DEFAULT):
+    """Embed a single string."""
+    return embed_texts(client, [text], model=model, dimensions=dimensions, cache=cache)[0]
+
+
+class EmbeddingBatch:
+    """Texts collected now and embedded later in one batched request.
+
+    Searches started while a reply is still streaming ``add`` their query
+    and use ``embed`` as their embed function: it blocks until ``flush``
+    has sent every text added so far in one ``embed_texts`` call. Texts
+    that were never added are embedded on their own. ``cancel`` releases
+    the waiters if the batch will never be sent.
+    """
+
+    def __init__(self, client, model=EMBEDDING_MODEL):
+        self.client = client
+        self.model = model
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def add(self, text):
+        with self._lock:
+            self._futures.setdefault(text, Future())
+
+    def embed(self, text):
+        with self._lock:
+            future = self._futures.get(text)
+        if future is None:
+            return embed_text(self.client, text, model=self.model)
+        return future.result()
+
+    def _take(self):
+        with self._lock:
+            waiting = [(text, future) for text, future in self._futures.items()
+                       if not (future.running() or future.done())]
+            return [(text, future) for text, future in waiting if future.set_running_or_notify_cancel()]
+
+    def flush(self):
+        """Embed every text added since the last flush; returns how many were sent."""
+        waiting = self._take()
+        if not waiting:
+            return 0
+        try:
+            vectors = embed_texts(self.client, [text for text, _ in waiting], model=self.model)
+        except BaseException as e:
+            for _, future in waiting:
+                future.set_exception(e)
+            raise
+        for (_, future), vector in zip(waiting, vectors):
+            future.set_result(vector)
+        return len(waiting)
+
+    def cancel(self):
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
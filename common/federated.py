@@ -0,0 +1,181 @@
+"""Federated retrieval over several collections with one query embedding.
+
+The HW4 (student organizations) and HW5 (syllabi) collections are separate
+stores, and querying both through ``hybrid_query`` costs two embedding
+round trips and two searches back to back. ``FederatedSearch`` searches
+every registered collection in one call: BM25 runs on each source while
+the query is being embedded, the single embedding is shared by the vector
+queries (all collections use ``EMBEDDING_MODEL``), and the sources run
+concurrently, so a federated query costs about as much as the slowest
+single-collection query.
+
+Scores are normalized before merging. Vector distances are min-max scaled
+over the candidates of all sources together (same embedding space, and
+the result no longer depends on whether the backend reports cosine or L2
+distances). BM25 scores are divided by the best score of their own source,
+since IDF differs from one index to the next. Each source has a quota: that
+many of its best chunks are always included (when it has any), and the
+remaining slots go to the best scores overall.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+FEDERATED_CANDIDATES = 10
+# Weight of the vector score against the BM25 score for sources with both.
+VECTOR_WEIGHT = 0.5
+
+
+@dataclass
+class FederatedHit:
+    source: str
+    id: str
+    score: float
+    document: str = None
+    metadata: dict = field(default_factory=dict)
+
+
+@dataclass
+class _Source:
+    name: str
+    # Anything with ``collection`` and ``lexical`` attributes (SharedCollection),
+    # read at query time so a rebuilt BM25 index is picked up.
+    store: object
+    quota: int = 1
+
+
+def _search_source(source, query, embedding, candidates):
+    """BM25 and vector candidates of one source; runs on the search pool."""
+    collection, lexical = source.store.collection, source.store.lexical
+    timings = {"lexical_s": 0.0, "vector_s": 0.0}
+    rows = {}
+
+    if lexical is not None and len(lexical):
+        start = time.perf_counter()
+        hits = lexical.search(query, k=candidates)
+        top = hits[0][0] if hits else 0.0
+        for score, row in hits:
+            rows[lexical.ids[row]] = {"bm25": score / top if top else 0.0}
+        timings["lexical_s"] = time.perf_counter() - start
+
+    vector = embedding.result()
+    start = time.perf_counter()
+    result = collection.query(query_embeddings=[vector], n_results=candidates,
+                              include=["documents", "metadatas", "distances"])
+    timings["vector_s"] = time.perf_counter() - start
+    for id_, document, metadata, distance in zip(result["ids"][0], result["documents"][0],
+                                                 result["metadatas"][0], result["distances"][0]):
+        rows.setdefault(id_, {}).update(document=document, metadata=metadata or {}, distance=distance)
+
+    missing = [id_ for id_, row in rows.items() if "document" not in row]
+    if missing:
+        fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+        for id_, document, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+            rows[id_].update(document=document, metadata=metadata or {})
+    timings["candidates"] = len(rows)
+    return rows, lexical is not None and len(lexical) > 0, timings
+
+
+class FederatedSearch:
+    def __init__(self, max_workers=4):
+        self._sources = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="federated")
+
+    def register(self, name, store, quota=1):
+        """Add (or replace) a searchable source."""
+        with self._lock:
+            self._sources[name] = _Source(name, store, quota)
+
+    def sources(self):
+        with self._lock:
+            return list(self._sources)
+
+    def embeddings(self, hits):
+        """Stored embedding of each hit (None if it's gone), one get per source."""
+        with self._lock:
+            stores = {name: source.store for name, source in self._sources.items()}
+        vectors = {}
+        for name in dict.fromkeys(hit.source for hit in hits):
+            fetched = stores[name].collection.get(ids=[hit.id for hit in hits if hit.source == name],
+                                                  include=["embeddings"])
+            vectors.update(((name, id_), vector) for id_, vector in zip(fetched["ids"], fetched["embeddings"]))
+        return [vectors.get((hit.source, hit.id)) for hit in hits]
+
+    def search(self, query, embed_fn, n_results=5, quotas=None, sources=None,
+               candidates=FEDERATED_CANDIDATES, query_embedding=None):
+        """Return ``(hits, info)``: up to n_results ``FederatedHit``, best first.
+
+        quotas maps source names to the minimum number of their chunks in
+        the result, overriding the registered quotas; sources limits the
+        search to some of the registered names. embed_fn(query) is called
+        once unless query_embedding is given. ``info`` has ``embed_s``,
+        ``total_s`` and per-source ``lexical_s``, ``vector_s`` and
+        ``candidates``.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            selected = [s for name, s in self._sources.items() if sources is None or name in sources]
+        quotas = {s.name: s.quota for s in selected} | dict(quotas or {})
+
+        # Sources start on BM25 and wait for the embedding, which is
+        # computed here rather than on the pool so it can't queue behind them.
+        embedding = Future()
+        futures = {s.name: self._pool.submit(_search_source, s, query, embedding, candidates) for s in selected}
+        info = {"mode": "federated", "embed_s": 0.0, "sources": {}}
+        if query_embedding is None:
+            embed_start = time.perf_counter()
+            try:
+                query_embedding = embed_fn(query)
+            except BaseException as e:
+                embedding.set_exception(e)
+                raise
+            finally:
+                info["embed_s"] = time.perf_counter() - embed_start
+        embedding.set_result(query_embedding)
+
+        results = {}
+        for name, future in futures.items():
+            rows, has_lexical, timings = future.result()
+            results[name] = (rows, has_lexical)
+            info["sources"][name] = timings
+
+        distances = [row["distance"] for rows, _ in results.values() for row in rows.values() if "distance" in row]
+        low, high = (min(distances), max(distances)) if distances else (0.0, 0.0)
+        ranked = {}
+        for name, (rows, has_lexical) in results.items():
+            hits = []
+            for id_, row in rows.items():
+                if "distance" in row:
+                    vector = (high - row["distance"]) / (high - low) if high > low else 1.0
+                else:
+                    vector = 0.0
+                score = VECTOR_WEIGHT * vector + (1 - VECTOR_WEIGHT) * row.get("bm25", 0.0) if has_lexical else vector
+                hits.append(FederatedHit(name, id_, score, row.get("document"), row.get("metadata", {})))
+            ranked[name] = sorted(hits, key=lambda hit: hit.score, reverse=True)
+
+        chosen = []
+        for name in sorted(ranked, key=lambda n: ranked[n][0].score if ranked[n] else 0.0, reverse=True):
+            room = n_results - len(chosen)
+            chosen.extend(ranked[name][:max(0, min(quotas.get(name, 0), room))])
+        taken = {(hit.source, hit.id) for hit in chosen}
+        rest = sorted((hit for hits in ranked.values() for hit in hits if (hit.source, hit.id) not in taken),
+                      key=lambda hit: hit.score, reverse=True)
+        chosen.extend(rest[:n_results - len(chosen)])
+
+        info["total_s"] = time.perf_counter() - start
+        return sorted(chosen, key=lambda hit: hit.score, reverse=True), info
+
+
+_default_federation = None
+_default_federation_lock = threading.Lock()
+
+
+def get_default_federation():
+    """Process-wide registry the pages add their collections to."""
+    global _default_federation
+    with _default_federation_lock:
+        if _default_federation is None:
+            _default_federation = FederatedSearch()
+        return _default_federation
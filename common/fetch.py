@@ -0,0 +1,133 @@
+"""Pooled, cached URL fetching for the URL summarizer pages.
+
+All requests share one connection-pooled ``requests.Session`` with
+timeouts. Extracted text is cached on disk along with the response's
+ETag/Last-Modified, and later fetches send a conditional GET, so an
+unchanged page costs a 304 instead of a download and a re-parse. Entries
+record the extractor version, and an entry made by another version is
+refetched in full rather than revalidated.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.html_text import html_to_text
+
+DEFAULT_CACHE_DIR = os.environ.get("URL_CACHE_DIR", "./.cache/urls")
+# (connect, read) timeouts in seconds.
+DEFAULT_TIMEOUT = (5, 20)
+USER_AGENT = "document-qa/1.0 (+https://github.com/nwkett/document-qa-nick-HW)"
+# Bump when page_text changes so cached text from the old extractor is dropped.
+EXTRACTOR_VERSION = "page-text-v2"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide session so keep-alive connections are reused."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _session = session
+        return _session
+
+
+class UrlCache:
+    """One JSON file per URL holding validators and the extracted text."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+
+    def _path(self, url):
+        return self.cache_dir / (hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            return json.loads(self._path(url).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(url)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def page_text(html):
+    """Visible text of an arbitrary page.
+
+    The whole <body> is kept: guessing the main element of an unknown site
+    can drop most of the page (several <article>s, a teaser <main>).
+    """
+    return html_to_text(html, main_content=False)
+
+
+def fetch_text(url, timeout=DEFAULT_TIMEOUT, cache=None, extract=page_text, extractor_version=EXTRACTOR_VERSION):
+    """Return the visible text of url, revalidating any cached copy.
+
+    Pass a distinct extractor_version with a custom extract, so the two
+    don't share cached text. Raises ``requests.RequestException`` on
+    network or HTTP errors.
+    """
+    cache = cache if cache is not None else UrlCache()
+    cached = cache.get(url)
+    if cached and cached.get("extractor") != extractor_version:
+        cached = None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_session().get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return cached["text"]
+    response.raise_for_status()
+
+    text = extract(response.content)
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if etag or last_modified:
+        cache.put(url, {
+            "etag": etag,
+            "last_modified": last_modified,
+            "text": text,
+            "extractor": extractor_version,
+            "fetched_at": time.time(),
+        })
+    return text
+
+
+def fetch_many(urls, timeout=DEFAULT_TIMEOUT, cache=None, max_workers=8):
+    """Fetch urls concurrently.
+
+    Returns ``{url: text}`` and ``{url: exception}`` for the failures.
+    """
+    urls = list(dict.fromkeys(urls))
+    texts, errors = {}, {}
+    if not urls:
+        return texts, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        futures = {url: pool.submit(fetch_text, url, timeout, cache) for url in urls}
+        for url, future in futures.items():
+            try:
+                texts[url] = future.result()
+            except requests.RequestException as e:
+                errors[url] = e
+    return texts, errors
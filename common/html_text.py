@@ -0,0 +1,171 @@
+"""Pluggable HTML-to-text extraction.
+
+Backends:
+    "selectolax"  lexbor parser via selectolax (fastest, optional dependency)
+    "lxml"        BeautifulSoup with the lxml parser (optional dependency)
+    "bs4"         BeautifulSoup with html.parser (the original behaviour)
+    "auto"        the fastest of the above that is installed
+
+With ``main_content=True`` a site template, if one matches, narrows
+extraction to the page's main element and strips the template's own
+boilerplate (navigation, prompts, empty fields). Otherwise common
+main-content elements are tried before falling back to <body>; that guess
+is only suited to known corpora, so arbitrary URLs use ``main_content=False``.
+
+Bytes are decoded with the page's declared or sniffed encoding, not
+assumed to be UTF-8.
+"""
+from functools import lru_cache
+
+DROP_TAGS = ("script", "style", "noscript", "template", "svg", "iframe")
+GENERIC_MAIN_SELECTORS = ("main", "article", "[role=main]")
+
+# Campus Labs Engage organization pages (HW4-Data/su_orgs). Every page is
+# the same React template, so its chrome and empty form fields are known.
+CAMPUSLABS_TEMPLATE = {
+    "name": "campuslabs-engage",
+    "markers": ('id="react-app"', "/engage/"),
+    "main": "#react-app",
+    "drop_lines": frozenset({
+        "About", "Contact", "Contact Information", "Additional Information",
+        "Officers", "View Full Roster", "Documents", "Public Events",
+        "View More Events", "View past events.", "Sign In To View Officers",
+        "There are currently no upcoming events.", "This organization has no officers.",
+        "Please describe the process students should take to join your organization.",
+    }),
+    "relabel": {"Who is your consultant in Student Engagement?": "Student Engagement consultant:"},
+    "empty_values": frozenset({"No Response"}),
+}
+
+TEMPLATES = (CAMPUSLABS_TEMPLATE,)
+
+
+@lru_cache(maxsize=None)
+def available_backends():
+    backends = []
+    try:
+        from selectolax.lexbor import LexborHTMLParser  # noqa: F401
+        backends.append("selectolax")
+    except ImportError:
+        pass
+    try:
+        import lxml  # noqa: F401
+        backends.append("lxml")
+    except ImportError:
+        pass
+    backends.append("bs4")
+    return tuple(backends)
+
+
+def resolve_backend(backend):
+    if backend == "auto":
+        return available_backends()[0]
+    if backend not in ("selectolax", "lxml", "bs4"):
+        raise ValueError(f"Unknown HTML backend {backend!r}")
+    return backend
+
+
+def match_template(html):
+    for template in TEMPLATES:
+        if all(marker in html for marker in template["markers"]):
+            return template
+    return None
+
+
+def _raw_text_selectolax(html, selectors):
+    from selectolax.lexbor import LexborHTMLParser
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(DROP_TAGS))
+    node = None
+    for selector in selectors:
+        node = tree.css_first(selector)
+        if node is not None:
+            break
+    node = node or tree.body or tree.root
+    return node.text(separator="\n") if node is not None else ""
+
+
+def _raw_text_bs4(html, selectors, parser):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, parser)
+    for tag in soup(list(DROP_TAGS)):
+        tag.decompose()
+    node = None
+    for selector in selectors:
+        node = soup.select_one(selector)
+        if node is not None:
+            break
+    node = node or soup.body or soup
+    return node.get_text(separator="\n")
+
+
+def _decode(html):
+    from bs4.dammit import EncodingDetector, UnicodeDammit
+    # A declared charset wins; otherwise UTF-8, then Windows-1252 (which
+    # also covers Latin-1) before any statistical guess.
+    declared = EncodingDetector.find_declared_encoding(html, is_html=True)
+    return UnicodeDammit(html, known_definite_encodings=[declared] if declared else [],
+                         user_encodings=["utf-8", "windows-1252"], is_html=True).unicode_markup
+
+
+def clean_lines(text):
+    """Split text into lines with whitespace collapsed, dropping empty ones."""
+    return [line for line in (" ".join(raw.split()) for raw in text.splitlines()) if line]
+
+
+def apply_template(lines, template):
+    """Drop a template's boilerplate and pair field labels with their values."""
+    cleaned = []
+    for line in lines:
+        if line in template["drop_lines"] or len(line) <= 1:
+            continue
+        for prefix, label in template["relabel"].items():
+            if line.startswith(prefix):
+                line = label
+        cleaned.append(line)
+
+    result = []
+    i = 0
+    while i < len(cleaned):
+        line = cleaned[i]
+        following = cleaned[i + 1] if i + 1 < len(cleaned) else None
+        if line.endswith(":") and following is not None and not following.endswith(":"):
+            if following not in template["empty_values"]:
+                result.append(f"{line} {following}")
+            i += 2
+            continue
+        if line.endswith(":") or line in template["empty_values"]:
+            i += 1
+            continue
+        if not result or result[-1] != line:
+            result.append(line)
+        i += 1
+    return result
+
+
+def html_to_lines(html, backend="auto", main_content=True):
+    """Extract visible text blocks from a HTML string, one per line."""
+    if isinstance(html, bytes):
+        html = _decode(html)
+    backend = resolve_backend(backend)
+    template = match_template(html) if main_content else None
+    if template:
+        selectors = (template["main"],)
+    elif main_content:
+        selectors = GENERIC_MAIN_SELECTORS
+    else:
+        selectors = ()
+
+    if backend == "selectolax":
+        text = _raw_text_selectolax(html, selectors)
+    else:
+        text = _raw_text_bs4(html, selectors, "lxml" if backend == "lxml" else "html.parser")
+
+    lines = clean_lines(text)
+    if template:
+        lines = apply_template(lines, template)
+    return lines
+
+
+def html_to_text(html, backend="auto", main_content=True):
+    return " ".join(html_to_lines(html, backend, main_content))
@@ -0,0 +1,300 @@
+"""Parallel, token-batched ingestion of document folders into a collection.
+
+Files are parsed on a process pool, their chunks are packed into embedding
+requests bounded by token count, and batches are embedded on a small thread
+pool and written to the collection as soon as each one finishes.
+
+``sync_folder`` keeps a manifest of file hashes next to the collection so
+that only new or edited files are re-embedded on startup.
+"""
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from common.embeddings import embed_texts
+from common.processes import process_pool
+from common.tokens import count_tokens
+
+# OpenAI caps an embeddings request at 2048 inputs and 300k tokens in total,
+# and each input at 8191 tokens. Stay comfortably under all three.
+MAX_BATCH_TOKENS = 100_000
+MAX_BATCH_ITEMS = 1024
+MAX_INPUT_TOKENS = 8000
+EMBED_CONCURRENCY = 4
+
+
+@dataclass
+class IngestStats:
+    files: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    batches: int = 0
+    failed_files: int = 0
+    seconds: float = 0.0
+    # Summed over workers, so they can add up to more than ``seconds``.
+    parse_seconds: float = 0.0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    failed_paths: list = field(default_factory=list)
+
+    def report(self):
+        secs = self.seconds or 1e-9
+        return (
+            f"{self.files} files, {self.chunks} chunks, {self.tokens} tokens "
+            f"in {self.seconds:.1f}s ({self.files / secs:.1f} files/s, "
+            f"{self.chunks / secs:.1f} chunks/s, {self.tokens / secs:.0f} tokens/s)"
+        )
+
+    def stages(self):
+        """Counts and per-stage seconds, e.g. as trace span attributes."""
+        return {
+            "files": self.files, "chunks": self.chunks, "tokens": self.tokens,
+            "extract_chunk_s": round(self.parse_seconds, 3),
+            "embed_s": round(self.embed_seconds, 3),
+            "write_s": round(self.write_seconds, 3),
+        }
+
+
+def pack_batches(chunks, max_tokens=MAX_BATCH_TOKENS, max_items=MAX_BATCH_ITEMS):
+    """Group chunks (dicts with a 'tokens' count) into embedding batches."""
+    batch, batch_tokens = [], 0
+    for chunk in chunks:
+        if batch and (batch_tokens + chunk['tokens'] > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += chunk['tokens']
+    if batch:
+        yield batch
+
+
+def _parse_worker(parse_fn, path):
+    """Run parse_fn in a worker and attach token counts to each chunk."""
+    start = time.perf_counter()
+    try:
+        chunks = parse_fn(path)
+    except Exception as e:
+        return path, [], str(e), time.perf_counter() - start
+    for chunk in chunks:
+        chunk['tokens'] = count_tokens(chunk['text'])
+        chunk.setdefault('source', Path(path).name)
+    return path, chunks, None, time.perf_counter() - start
+
+
+def _embed_batch(client, batch):
+    start = time.perf_counter()
+    texts = [chunk['text'] for chunk in batch]
+    embeddings = embed_texts(client, texts)
+    return batch, embeddings, time.perf_counter() - start
+
+
+def _chunk_metadata(chunk):
+    return {key: value for key, value in chunk.items() if key not in ('text', 'id', 'tokens')}
+
+
+def _write_batch(collection, batch, embeddings):
+    collection.upsert(
+        documents=[chunk['text'] for chunk in batch],
+        ids=[chunk['id'] for chunk in batch],
+        embeddings=embeddings,
+        metadatas=[_chunk_metadata(chunk) for chunk in batch],
+    )
+
+
+def _parsed_chunks(paths, parse_fn, max_workers, stats, on_error):
+    """Yield chunks from every file, parsing on a process pool."""
+    if max_workers == 1:
+        results = (_parse_worker(parse_fn, path) for path in paths)
+        pool = None
+    else:
+        pool = process_pool(max_workers)
+        results = pool.map(_parse_worker, [parse_fn] * len(paths), paths, chunksize=8)
+    try:
+        for path, chunks, error, seconds in results:
+            stats.files += 1
+            stats.parse_seconds += seconds
+            if error:
+                stats.failed_files += 1
+                stats.failed_paths.append(path)
+                if on_error:
+                    on_error(path, error)
+                continue
+            for chunk in chunks:
+                if chunk['tokens'] > MAX_INPUT_TOKENS:
+                    if on_error:
+                        on_error(path, f"chunk {chunk['id']} has {chunk['tokens']} tokens, skipping")
+                    continue
+                yield chunk
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def ingest_files(paths, parse_fn, collection, client,
+                 max_workers=None, embed_concurrency=EMBED_CONCURRENCY,
+                 max_batch_tokens=MAX_BATCH_TOKENS, on_error=None, on_progress=None):
+    """Parse, embed and add every file in paths to collection.
+
+    parse_fn must be a picklable top-level function mapping a path to a list
+    of ``{'text', 'id'}`` chunk dicts. ``on_progress(stats, total_files)``
+    is called after each batch is written. Returns an IngestStats.
+    """
+    paths = list(paths)
+    stats = IngestStats()
+    start = time.perf_counter()
+    max_workers = max_workers or min(len(paths), os.cpu_count() or 1) or 1
+
+    chunks = _parsed_chunks(paths, parse_fn, max_workers, stats, on_error)
+    with ThreadPoolExecutor(max_workers=embed_concurrency) as embed_pool:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                batch, embeddings, seconds = future.result()
+                stats.embed_seconds += seconds
+                # Collection writes stay on this thread.
+                write_start = time.perf_counter()
+                _write_batch(collection, batch, embeddings)
+                stats.write_seconds += time.perf_counter() - write_start
+                stats.batches += 1
+                stats.chunks += len(batch)
+                stats.tokens += sum(chunk['tokens'] for chunk in batch)
+                if on_progress is not None:
+                    on_progress(stats, len(paths))
+
+        for batch in pack_batches(chunks, max_tokens=max_batch_tokens):
+            pending.add(embed_pool.submit(_embed_batch, client, batch))
+            # Bound the number of batches held in memory at once.
+            if len(pending) >= embed_concurrency * 2:
+                drain(FIRST_COMPLETED)
+        if pending:
+            drain(ALL_COMPLETED)
+
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+
+def file_hash(path):
+    """sha256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """Read a collection manifest, or None if there isn't one yet."""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def save_manifest(manifest_path, manifest):
+    """Write the manifest atomically so a crash never leaves it half written."""
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix(manifest_path.suffix + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+@dataclass
+class SyncPlan:
+    changed: list
+    removed: list
+    unchanged: list
+    rebuild: bool = False
+
+    def summary(self):
+        return (f"{len(self.changed)} new/changed, {len(self.removed)} removed, "
+                f"{len(self.unchanged)} unchanged")
+
+
+def plan_sync(paths, manifest, chunker_version, collection_count):
+    """Compare files on disk with the manifest and decide what to re-embed."""
+    hashes = {Path(path).name: file_hash(path) for path in paths}
+    if manifest is None or manifest.get('chunker_version') != chunker_version:
+        # No manifest (a collection built before manifests existed) or a new
+        # chunker: every stored chunk is stale.
+        old_files = (manifest or {}).get('files', {})
+        return hashes, SyncPlan(
+            changed=list(paths), removed=list(old_files), unchanged=[],
+            rebuild=manifest is None and collection_count > 0,
+        )
+
+    old_files = manifest.get('files', {})
+    changed = [path for path in paths if old_files.get(Path(path).name) != hashes[Path(path).name]]
+    unchanged = [path for path in paths if old_files.get(Path(path).name) == hashes[Path(path).name]]
+    removed = [name for name in old_files if name not in hashes]
+    return hashes, SyncPlan(changed=changed, removed=removed, unchanged=unchanged)
+
+
+def _delete_sources(collection, names):
+    names = list(names)
+    for i in range(0, len(names), 500):
+        collection.delete(where={'source': {'$in': names[i:i + 500]}})
+
+
+def _clear_collection(collection):
+    ids = collection.get(include=[])['ids']
+    for i in range(0, len(ids), 5000):
+        collection.delete(ids=ids[i:i + 5000])
+
+
+def sync_folder(paths, parse_fn, collection, client, manifest_path, chunker_version,
+                lexical_path=None, **kwargs):
+    """Bring collection in line with the files in paths.
+
+    Only new or changed files are parsed and embedded; chunks of edited or
+    deleted files are removed first. If lexical_path is given, the BM25
+    index there is rebuilt whenever the collection changed (or is missing).
+    Returns ``(plan, stats)``.
+    """
+    paths = list(paths)
+    manifest = load_manifest(manifest_path)
+    hashes, plan = plan_sync(paths, manifest, chunker_version, collection.count())
+
+    if plan.rebuild:
+        _clear_collection(collection)
+    else:
+        stale = set(plan.removed)
+        stale.update(Path(path).name for path in plan.changed)
+        stale &= set((manifest or {}).get('files', {}))
+        if stale:
+            _delete_sources(collection, stale)
+
+    stats = ingest_files(plan.changed, parse_fn, collection, client, **kwargs) if plan.changed else IngestStats()
+    # Stores that buffer writes (NumpyVectorStore) persist them here.
+    flush = getattr(collection, 'flush', None)
+    if flush is not None:
+        flush()
+
+    if lexical_path is not None and (plan.changed or plan.removed or not Path(lexical_path).exists()):
+        from common.lexical import LexicalIndex
+        LexicalIndex.from_collection(collection).save(lexical_path)
+
+    failed = {Path(path).name for path in stats.failed_paths}
+    save_manifest(manifest_path, {
+        'chunker_version': chunker_version,
+        'files': {name: digest for name, digest in hashes.items() if name not in failed},
+    })
+    return plan, stats
+
+
+def manifest_fingerprint(manifest_path):
+    """Short hash identifying the current contents of a collection."""
+    try:
+        with open(manifest_path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()[:16]
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,250 @@
+"""Background ingestion, so no page request waits for an index build.
+
+``IngestWorker`` runs jobs one at a time on a daemon thread fed by a queue
+(parsing inside a job still fans out to ``sync_folder``'s process pool).
+Each job gets a ``JobProgress`` that it updates as batches are written and
+that pages poll to show a progress bar. Chunks land in the collection batch
+by batch, so queries made while a job runs are answered from whatever has
+been indexed so far.
+
+A page describes its documents with a ``Corpus``; ``open_store`` opens the
+collection and queues its sync, and ``show_ingestion`` renders the
+progress bar and, once per session, the sync notes.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from common.ingest import sync_folder
+from common.lexical import LexicalIndex, lexical_index_path
+from common.tracing import TRACING_DEFAULT, start_trace
+from common.vector_store import manifest_path, open_collection
+
+
+@dataclass
+class JobProgress:
+    name: str
+    state: str = "queued"  # queued, running, done or failed
+    files_total: int = 0
+    files_done: int = 0
+    chunks: int = 0
+    error: str = None
+    # (level, message) pairs for the page to show when the job is over.
+    notes: list = field(default_factory=list)
+    queued_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.state in ("done", "failed")
+
+    @property
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        return self.files_done / self.files_total if self.files_total else 0.0
+
+    def update(self, stats, total_files):
+        """``on_progress`` callback for ``ingest_files`` / ``sync_folder``."""
+        self.files_total = total_files
+        self.files_done = stats.files
+        self.chunks = stats.chunks
+
+    def describe(self):
+        if self.state == "queued":
+            return f"{self.name}: waiting to index"
+        if self.state == "running":
+            if not self.files_total:
+                return f"{self.name}: checking for changed files"
+            return (f"{self.name}: indexed {self.files_done}/{self.files_total} changed files "
+                    f"({self.chunks} chunks)")
+        if self.state == "failed":
+            return f"{self.name}: indexing failed: {self.error}"
+        return f"{self.name}: index up to date"
+
+
+@dataclass(frozen=True)
+class Corpus:
+    """A folder of documents kept in sync with a vector collection."""
+    key: str  # page prefix for session_state keys ("HW4")
+    name: str  # job and federated-search source name
+    folder: str
+    pattern: str
+    kind: str  # file type for messages ("HTML")
+    parse_fn: Callable
+    chunker_version: str
+    store_path: str
+    collection_name: str
+    # Guaranteed chunks of this corpus in a federated search.
+    quota: int = 1
+
+    @property
+    def manifest(self):
+        # The backend (Chroma by default) is picked by VECTOR_STORE_BACKEND.
+        return manifest_path(self.store_path, self.collection_name)
+
+
+@dataclass
+class SharedCollection:
+    """A collection and its BM25 index, shared by every session of a page.
+
+    A sync job fills the collection in place and swaps in the rebuilt
+    ``lexical`` index when it finishes.
+    """
+    collection: object
+    lexical: object = None
+    progress: JobProgress = None
+    # Formatted trace of the last sync job, for the diagnostics panel.
+    trace: str = ""
+    corpus: Corpus = None
+
+
+class IngestWorker:
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="ingest-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, name, fn, *args, **kwargs):
+        """Queue ``fn(progress, *args, **kwargs)``; returns its JobProgress."""
+        progress = JobProgress(name)
+        self._jobs.put((progress, fn, args, kwargs))
+        return progress
+
+    def join(self):
+        """Block until every queued job has finished."""
+        self._jobs.join()
+
+    def _run(self):
+        while True:
+            progress, fn, args, kwargs = self._jobs.get()
+            progress.state = "running"
+            try:
+                fn(progress, *args, **kwargs)
+                progress.state = "done"
+            except Exception as e:
+                progress.error = str(e)
+                progress.notes.append(("error", f"{progress.name}: indexing failed: {e}"))
+                progress.state = "failed"
+            finally:
+                progress.finished_at = time.time()
+                self._jobs.task_done()
+
+
+_default_worker = None
+_default_worker_lock = threading.Lock()
+
+
+def get_default_worker():
+    """Process-wide worker shared by every page."""
+    global _default_worker
+    with _default_worker_lock:
+        if _default_worker is None:
+            _default_worker = IngestWorker()
+        return _default_worker
+
+
+def load_files_to_collection(corpus, collection, client, trace, on_progress=None):
+    """Sync the corpus folder into the collection.
+
+    Only files whose content hash differs from the manifest are re-embedded,
+    and chunks of deleted files are removed. Returns ``(level, message)``
+    notes for the page to show.
+    """
+    files = sorted(Path(corpus.folder).glob(corpus.pattern))
+
+    if not files and collection.count() == 0:
+        return [("warning", f"No {corpus.kind} files found in {corpus.folder}")]
+
+    notes = []
+
+    def report_error(path, error):
+        notes.append(("error", f"Error reading {path}: {error}"))
+
+    # Files are parsed on a process pool and chunks are embedded in
+    # token-bounded batches, so the corpus never hits the per-request limit.
+    try:
+        with trace.span("ingest", folder=str(corpus.folder)) as span:
+            plan, stats = sync_folder(
+                files, corpus.parse_fn, collection, client,
+                corpus.manifest, corpus.chunker_version, on_error=report_error,
+                lexical_path=lexical_index_path(corpus.manifest), on_progress=on_progress,
+            )
+            span.update(stats.stages())
+    except Exception as e:
+        notes.append(("error", f"Error adding {corpus.kind} files to collection: {e}"))
+        return notes
+
+    if plan.changed or plan.removed:
+        notes.append(("success", f"✅ Synced {corpus.kind} files into the vector store "
+                                 f"({plan.summary()}, {stats.chunks} chunks embedded)"))
+        if stats.files:
+            notes.append(("caption", f"Ingestion: {stats.report()}"))
+    else:
+        notes.append(("info", f"Collection already contains {collection.count()} documents"))
+    return notes
+
+
+def sync_store(progress, store, client):
+    """Ingestion job; runs on the background worker, not in a page request."""
+    corpus = store.corpus
+    trace = start_trace(f"{corpus.key}.ingest", enabled=TRACING_DEFAULT)
+    progress.notes = load_files_to_collection(corpus, store.collection, client, trace, on_progress=progress.update)
+    store.lexical = LexicalIndex.load(lexical_index_path(corpus.manifest))
+    store.trace = trace.end().format()
+
+
+def queue_sync(store, client):
+    store.progress = get_default_worker().submit(store.corpus.name, sync_store, store, client)
+
+
+def open_store(corpus, client):
+    """Open the corpus collection and queue its sync; returns the SharedCollection.
+
+    Call once per process (the pages wrap it in ``st.cache_resource``). The
+    store is also registered for federated search.
+    """
+    from common.federated import get_default_federation
+
+    collection = open_collection(corpus.store_path, corpus.collection_name)
+    store = SharedCollection(collection, LexicalIndex.load(lexical_index_path(corpus.manifest)), corpus=corpus)
+    queue_sync(store, client)
+    get_default_federation().register(corpus.name, store, quota=corpus.quota)
+    return store
+
+
+def show_ingestion(store):
+    """Page UI: a live progress bar while a sync runs, then its notes once per session.
+
+    Chat works throughout, answering from whatever has been indexed so far.
+    """
+    import streamlit as st
+
+    ready_key = f"{store.corpus.key}_store_ready"
+
+    @st.fragment(run_every=1.0)
+    def ingestion_status():
+        progress = store.progress
+        if progress.finished:
+            st.rerun()
+        st.progress(progress.fraction, text=progress.describe())
+        st.caption(f"Answers use the {store.collection.count()} chunks indexed so far.")
+
+    if not store.progress.finished:
+        ingestion_status()
+    elif ready_key not in st.session_state:
+        for level, text in store.progress.notes:
+            getattr(st, level)(text)
+        st.session_state[ready_key] = True
+        st.session_state[f"{store.corpus.key}_trace"] = store.trace
+
+
+def resync(store, client):
+    """Queue a new sync of store and show its notes again when it's done."""
+    import streamlit as st
+
+    queue_sync(store, client)
+    st.session_state.pop(f"{store.corpus.key}_store_ready", None)
@@ -0,0 +1,233 @@
+"""BM25 keyword index and hybrid (BM25 + vector) retrieval.
+
+Dense retrieval is good at paraphrases but can miss exact names and codes
+("Alpha Phi Omega", "IST 387"), and every query costs an embedding request.
+``LexicalIndex`` is a small BM25 inverted index over the same chunks as a
+vector collection; ``sync_folder`` rebuilds it whenever the collection
+changes and stores it next to the manifest.
+
+``hybrid_query`` answers with the BM25 ranking alone when it is confident
+(a short query whose informative terms all occur in the best chunk, and one
+source clearly ahead of the rest), skipping the embedding call. Otherwise
+both rankings are fused with reciprocal-rank fusion.
+
+``search_key`` and ``same_search`` tell when two phrasings of a question
+(the user's prompt and the model's tool query) would search for the same
+thing, so a search already started for one can answer the other.
+"""
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+HYBRID_CANDIDATES = 20
+# Confidence rule for answering from BM25 alone.
+CONFIDENT_MAX_TERMS = 8
+CONFIDENT_MARGIN = 1.5
+# Terms in more than this fraction of chunks don't count as informative.
+COMMON_TERM_DF = 0.25
+# Sources of the best BM25 chunks compared by same_search.
+SEARCH_KEY_SOURCES = 2
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about an and any are as at be by can do does for from has have how i in is it
+its me my of on or tell the their there this to was what when where which who why
+with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def lexical_index_path(manifest_path):
+    """Where the BM25 index for the collection with this manifest lives."""
+    manifest_path = Path(manifest_path)
+    return manifest_path.with_name(manifest_path.name.replace(".manifest.json", "") + ".bm25.json")
+
+
+class LexicalIndex:
+    def __init__(self, ids, sources, postings, doc_lengths):
+        self.ids = ids
+        self.sources = sources
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+
+    @classmethod
+    def build(cls, ids, documents, sources=None):
+        postings = defaultdict(list)
+        doc_lengths = []
+        for row, text in enumerate(documents):
+            terms = Counter(tokenize(text or ""))
+            doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings[term].append((row, tf))
+        return cls(list(ids), list(sources or ids), dict(postings), doc_lengths)
+
+    @classmethod
+    def from_collection(cls, collection):
+        data = collection.get(include=["documents", "metadatas"])
+        sources = [(meta or {}).get("source", id_) for id_, meta in zip(data["ids"], data["metadatas"])]
+        # File names carry course codes and org slugs, so index them too.
+        texts = [f"{Path(source).stem} {text or ''}" for source, text in zip(sources, data["documents"])]
+        return cls.build(data["ids"], texts, sources)
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "ids": self.ids, "sources": self.sources,
+            "postings": self.postings, "doc_lengths": self.doc_lengths,
+        }), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved index, or None if there isn't one."""
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return cls(data["ids"], data["sources"], data["postings"], data["doc_lengths"])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def idf(self, term):
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, k=10):
+        """Return up to k ``(score, row)`` pairs, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf(term)
+            for row, tf in self.postings.get(term, ()):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[row] / (self.avg_length or 1))
+                scores[row] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return sorted(((score, row) for row, score in scores.items()), reverse=True)[:k]
+
+    def is_confident(self, query, hits):
+        """Whether hits for query are good enough to skip vector search."""
+        terms = set(tokenize(query))
+        if not hits or not terms or len(terms) > CONFIDENT_MAX_TERMS:
+            return False
+        n = len(self.ids)
+        informative = {t for t in terms if len(self.postings.get(t, ())) <= COMMON_TERM_DF * n}
+        if not informative:
+            return False
+        top_row = hits[0][1]
+        for term in informative:
+            if not any(row == top_row for row, _ in self.postings.get(term, ())):
+                return False
+        # The best chunk of the top source must clearly beat every other source.
+        top_source = self.sources[top_row]
+        runner_up = next((score for score, row in hits if self.sources[row] != top_source), 0.0)
+        return hits[0][0] >= CONFIDENT_MARGIN * runner_up
+
+
+def rrf_fuse(rankings, k=RRF_K):
+    """Reciprocal-rank fusion of several ranked id lists."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking):
+            scores[id_] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def needs_embedding(lexical, query, candidates=HYBRID_CANDIDATES):
+    """Whether ``hybrid_query`` would embed query (BM25 alone isn't confident).
+
+    Lets callers embed several queries in one batched request up front.
+    """
+    if lexical is None or not len(lexical):
+        return True
+    return not lexical.is_confident(query, lexical.search(query, k=candidates))
+
+
+def search_key(lexical, query, k=SEARCH_KEY_SOURCES):
+    """``(terms, sources)`` of query: its terms and the sources of its k best BM25 chunks."""
+    sources = ()
+    if lexical is not None and len(lexical):
+        sources = (lexical.sources[row] for _, row in lexical.search(query, k=k))
+    return frozenset(tokenize(query)), frozenset(sources)
+
+
+def same_search(key, other):
+    """Whether two ``search_key`` results would retrieve the same chunks.
+
+    True for the same terms ("IST 387" and "What is IST 387 about?"), or
+    for queries sharing a term whose best BM25 chunks come from the same
+    sources ("IST 256 grading" and "IST 256 grade breakdown").
+    """
+    terms, sources = key
+    other_terms, other_sources = other
+    if terms == other_terms:
+        return True
+    return bool(sources) and sources == other_sources and bool(terms & other_terms)
+
+
+def hybrid_query(collection, lexical, query, embed_fn, n_results=3, candidates=HYBRID_CANDIDATES,
+                 include=("documents", "metadatas"), query_embedding=None):
+    """Retrieve n_results chunks for query, Chroma result shape plus ``info``.
+
+    embed_fn(query) is only called when the BM25 ranking isn't confident
+    (and no query_embedding was given). ``info`` has the mode used
+    (``lexical``, ``hybrid`` or ``vector``), timings in seconds and the
+    query ``embedding`` (None in lexical mode), for reuse by the caller.
+    """
+    info = {"mode": "vector", "lexical_s": 0.0, "embed_s": 0.0, "vector_s": 0.0, "embedding": None}
+    lexical_ids = []
+    if lexical is not None and len(lexical):
+        start = time.perf_counter()
+        hits = lexical.search(query, k=candidates)
+        confident = lexical.is_confident(query, hits)
+        lexical_ids = [lexical.ids[row] for _, row in hits]
+        info["lexical_s"] = time.perf_counter() - start
+        if confident:
+            info["mode"] = "lexical"
+            ids = lexical_ids[:n_results]
+            return _with_documents(collection, ids, include), info
+
+    if query_embedding is None:
+        start = time.perf_counter()
+        query_embedding = embed_fn(query)
+        info["embed_s"] = time.perf_counter() - start
+    info["embedding"] = query_embedding
+    start = time.perf_counter()
+    vector = collection.query(query_embeddings=[query_embedding], n_results=candidates if lexical_ids else n_results,
+                              include=list(include))
+    info["vector_s"] = time.perf_counter() - start
+    if not lexical_ids:
+        return {key: [vector[key][0][:n_results]] for key in ("ids", *include)}, info
+
+    info["mode"] = "hybrid"
+    ids = rrf_fuse([vector["ids"][0], lexical_ids])[:n_results]
+    return _with_documents(collection, ids, include, vector), info
+
+
+def _with_documents(collection, ids, include, known=None):
+    """Build a one-query Chroma-style result for ids, fetching what's missing."""
+    rows = {}
+    if known is not None:
+        for i, id_ in enumerate(known["ids"][0]):
+            rows[id_] = {key: known[key][0][i] for key in include if known.get(key)}
+    missing = [id_ for id_ in ids if id_ not in rows]
+    if missing:
+        fetched = collection.get(ids=missing, include=list(include))
+        for i, id_ in enumerate(fetched["ids"]):
+            rows[id_] = {key: fetched[key][i] for key in include if fetched.get(key)}
+    ids = [id_ for id_ in ids if id_ in rows]
+    result = {"ids": [ids]}
+    for key in include:
+        result[key] = [[rows[id_].get(key) for id_ in ids]]
+    return result
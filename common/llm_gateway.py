@@ -0,0 +1,338 @@
+"""Async gateway over the chat providers (OpenAI and Gemini).
+
+Every page streams completions through ``LLMGateway``. One call gets:
+
+* a deadline for the whole call and a budget for the first token,
+* jittered exponential-backoff retries of transient errors, up to the
+  point where text has started streaming,
+* an optional fallback route if the primary route fails, and
+* optional hedging: if the primary hasn't produced a first token within
+  ``hedge_after`` seconds, the fallback is started too and whichever
+  produces text first wins (the other is cancelled).
+
+With ``deltas=True`` the gateway yields the provider's raw stream chunks
+instead of text, so completions that may call tools (``ToolCallStream``)
+get the same deadline, retry and fallback policy; only providers with a
+``stream_deltas`` method (OpenAI) can serve those routes.
+
+The gateway runs on one background event loop per process; ``stream_sync``
+bridges it to the plain iterators ``st.write_stream`` expects.
+"""
+import asyncio
+import queue
+import random
+import threading
+from dataclasses import dataclass, field
+
+DEFAULT_DEADLINE = 120.0
+DEFAULT_FIRST_TOKEN_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+
+_RETRYABLE_NAMES = {
+    # openai
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError",
+    # google.api_core
+    "ServiceUnavailable", "ResourceExhausted", "DeadlineExceeded", "InternalServerError",
+    "TooManyRequests", "GatewayTimeout",
+    # ours / asyncio
+    "TimeoutError", "FirstTokenTimeout",
+}
+
+
+class GatewayError(Exception):
+    """Raised when every route of a call failed."""
+
+
+class FirstTokenTimeout(TimeoutError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_retryable(exc):
+    if type(exc).__name__ in _RETRYABLE_NAMES:
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+@dataclass(frozen=True)
+class Route:
+    provider: str
+    model: str
+
+    def __str__(self):
+        return f"{self.provider}:{self.model}"
+
+
+@dataclass
+class CallStats:
+    route: str = ""
+    attempts: int = 0
+    hedged: bool = False
+    time_to_first_token: float = None
+    total: float = None
+    chunks: int = 0
+    errors: list = field(default_factory=list)
+
+
+class OpenAIProvider:
+    def __init__(self, api_key, base_url=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+        self._client_loop = None
+
+    def _get_client(self):
+        # The async client's connection pool belongs to one event loop, so
+        # build it lazily on (and rebuild it for) the loop that uses it.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            from openai import AsyncOpenAI
+            # Retries are handled by the gateway.
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+            self._client_loop = loop
+        return self._client
+
+    async def stream(self, messages, model, **kwargs):
+        stream = await self._get_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def stream_deltas(self, messages, model, **kwargs):
+        """Yield the raw chunks that carry text, tool-call deltas or a finish reason."""
+        stream = await self._get_client().chat.completions.create(
+            model=model, messages=messages, stream=True, **kwargs
+        )
+        async for chunk in stream:
+            # Skip the leading role-only chunk so the first item counts as the first token.
+            if chunk.choices and (chunk.choices[0].delta.content or chunk.choices[0].delta.tool_calls
+                                  or chunk.choices[0].finish_reason):
+                yield chunk
+
+
+def messages_to_prompt(messages):
+    """Flatten chat messages into one prompt for providers without roles."""
+    lines = []
+    for m in messages:
+        if not isinstance(m.get("content"), str):
+            continue
+        lines.append(f"{m['role'].upper()}: {m['content']}")
+    return "\n".join(lines)
+
+
+class GeminiProvider:
+    def __init__(self, api_key, get_model):
+        # get_model(api_key, model) returns a GenerativeModel; genai.configure
+        # is process-global, so it must come from the shared ClientRegistry
+        # rather than be configured per provider.
+        self.api_key = api_key
+        self._get_model = get_model
+
+    async def stream(self, messages, model, **kwargs):
+        response = await self._get_model(self.api_key, model).generate_content_async(
+            messages_to_prompt(messages), stream=True, **kwargs
+        )
+        async for chunk in response:
+            text = getattr(chunk, "text", None)
+            if text:
+                yield text
+
+
+class LLMGateway:
+    def __init__(self, providers=None, deadline=DEFAULT_DEADLINE,
+                 first_token_timeout=DEFAULT_FIRST_TOKEN_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF):
+        self.providers = dict(providers or {})
+        self.deadline = deadline
+        self.first_token_timeout = first_token_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    def register(self, name, provider):
+        self.providers[name] = provider
+
+    def has_provider(self, name):
+        return name in self.providers
+
+    # -- async API ---------------------------------------------------------
+
+    async def _open(self, messages, route, deadline_at, stats, kwargs, deltas=False):
+        """Start a stream on route and wait for its first chunk, with retries.
+
+        Returns ``(first_chunk, async_iterator, route)``.
+        """
+        provider = self.providers.get(route.provider)
+        if provider is None:
+            raise GatewayError(f"No provider registered for {route}")
+        if deltas and not hasattr(provider, "stream_deltas"):
+            raise GatewayError(f"{route} can't stream raw deltas")
+        stream = provider.stream_deltas if deltas else provider.stream
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            stats.attempts += 1
+            remaining = deadline_at - loop.time()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Deadline exceeded before {route} answered")
+            agen = stream(messages, route.model, **kwargs)
+            try:
+                first = await asyncio.wait_for(anext(agen), min(self.first_token_timeout, remaining))
+                return first, agen, route
+            except StopAsyncIteration:
+                return None, agen, route
+            except asyncio.TimeoutError:
+                error = FirstTokenTimeout(f"No first token from {route}")
+            except asyncio.CancelledError:
+                await agen.aclose()
+                raise
+            except Exception as e:
+                error = e
+            await agen.aclose()
+            stats.errors.append(f"{route}: {type(error).__name__}: {error}")
+            if attempt == self.retries or not is_retryable(error):
+                raise error
+            # Full jitter keeps concurrent sessions from retrying in lockstep.
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            await asyncio.sleep(min(delay, max(0.0, deadline_at - loop.time())))
+
+    async def _first_of(self, tasks):
+        """Return the result of the first task to succeed, cancelling the rest."""
+        pending = set(tasks)
+        errors = []
+        winner = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task
+                    else:
+                        # Both finished in the same tick; drop the second stream.
+                        _close_result(task)
+                if winner is not None:
+                    return winner.result()
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+                # Close the losing stream once its task has stopped.
+                task.add_done_callback(_close_result)
+
+    async def astream(self, messages, route, fallback=None, hedge_after=None,
+                      deadline=None, stats=None, deltas=False, **kwargs):
+        """Yield text deltas (raw chunks with deltas=True) for messages from route (or fallback)."""
+        stats = stats if stats is not None else CallStats()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline_at = started + (deadline or self.deadline)
+
+        primary = asyncio.ensure_future(self._open(messages, route, deadline_at, stats, kwargs, deltas))
+        try:
+            if fallback and hedge_after is not None:
+                done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+                if done and primary.exception() is None:
+                    first, agen, winner_route = primary.result()
+                else:
+                    # Slow (or already failed) primary: race the fallback.
+                    stats.hedged = True
+                    backup = asyncio.ensure_future(self._open(messages, fallback, deadline_at, stats, kwargs, deltas))
+                    tasks = [backup] if done else [primary, backup]
+                    first, agen, winner_route = await self._first_of(tasks)
+            else:
+                try:
+                    first, agen, winner_route = await primary
+                except Exception as e:
+                    if not fallback:
+                        raise
+                    stats.errors.append(f"{route}: {type(e).__name__}: {e}")
+                    first, agen, winner_route = await self._open(messages, fallback, deadline_at, stats, kwargs, deltas)
+        except asyncio.CancelledError:
+            primary.cancel()
+            primary.add_done_callback(_close_result)
+            raise
+        except Exception as e:
+            if isinstance(e, (GatewayError, TimeoutError)):
+                raise
+            raise GatewayError(f"All routes failed: {'; '.join(stats.errors) or e}") from e
+
+        stats.route = str(winner_route)
+        stats.time_to_first_token = loop.time() - started
+        try:
+            if first is not None:
+                stats.chunks += 1
+                yield first
+            while True:
+                remaining = deadline_at - loop.time()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"Deadline exceeded while streaming from {winner_route}")
+                try:
+                    text = await asyncio.wait_for(anext(agen), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Deadline exceeded while streaming from {winner_route}")
+                stats.chunks += 1
+                yield text
+        finally:
+            await agen.aclose()
+            stats.total = loop.time() - started
+
+    # -- sync bridge -------------------------------------------------------
+
+    def _get_loop(self):
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="llm-gateway", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    def stream_sync(self, messages, route, fallback=None, hedge_after=None,
+                    deadline=None, stats=None, deltas=False, **kwargs):
+        """Blocking iterator over text deltas (or raw chunks), for ``st.write_stream``."""
+        chunks = queue.Queue()
+
+        async def pump():
+            try:
+                async for text in self.astream(messages, route, fallback, hedge_after,
+                                               deadline, stats, deltas, **kwargs):
+                    chunks.put(("text", text))
+                chunks.put(("end", None))
+            except BaseException as e:
+                chunks.put(("error", e))
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._get_loop())
+        try:
+            while True:
+                kind, value = chunks.get()
+                if kind == "text":
+                    yield value
+                elif kind == "end":
+                    return
+                else:
+                    raise value
+        finally:
+            # The consumer stopped early (e.g. the rerun was interrupted).
+            future.cancel()
+
+    def complete_sync(self, messages, route, **kwargs):
+        """Collect a whole streamed answer into one string."""
+        return "".join(self.stream_sync(messages, route, **kwargs))
+
+
+def _close_result(task):
+    if task.cancelled() or task.exception() is not None:
+        return
+    _, agen, _ = task.result()
+    asyncio.ensure_future(agen.aclose())
@@ -0,0 +1,59 @@
+"""Small in-memory vector index for per-session documents.
+
+Used where building a persistent Chroma collection would be overkill: an
+uploaded document in HW1 or the loaded URLs in HW3. Vectors are kept as a
+normalized float32 matrix and searched with one matrix-vector product.
+"""
+import hashlib
+
+import numpy as np
+
+from common.embeddings import embed_texts
+from common.ingest import pack_batches
+from common.tokens import count_tokens
+
+
+def content_hash(data):
+    """sha256 of bytes or text, used to key indexes by their source content."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class MemoryIndex:
+    def __init__(self, chunks, embeddings):
+        self.chunks = list(chunks)
+        matrix = np.asarray(embeddings, dtype=np.float32).reshape(len(self.chunks), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+    @classmethod
+    def build(cls, client, chunks):
+        """Embed ``{'text', 'id'}`` chunks in token-bounded batches."""
+        chunks = list(chunks)
+        for chunk in chunks:
+            chunk.setdefault('tokens', count_tokens(chunk['text']))
+        embeddings = []
+        for batch in pack_batches(chunks):
+            embeddings.extend(embed_texts(client, [chunk['text'] for chunk in batch]))
+        return cls(chunks, embeddings)
+
+    def __len__(self):
+        return len(self.chunks)
+
+    @property
+    def total_tokens(self):
+        return sum(chunk.get('tokens', 0) for chunk in self.chunks)
+
+    def search(self, query_embedding, k=5):
+        """Return up to k ``(score, chunk)`` pairs, best first."""
+        if not self.chunks:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top]
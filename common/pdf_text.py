@@ -0,0 +1,93 @@
+"""One PDF text extraction engine for every page that reads PDFs.
+
+Pages are streamed through a generator and joined once at the end instead
+of growing a string with ``+=``. Two backends are supported: PyMuPDF
+(``fitz``, the default and much faster) and PyPDF2. Documents with many
+pages can be fanned out across processes in contiguous page ranges.
+
+A source is either a filesystem path or the raw bytes of a PDF.
+"""
+import io
+import os
+from pathlib import Path
+
+from common.processes import process_pool
+
+BACKENDS = ("pymupdf", "pypdf2")
+DEFAULT_BACKEND = "pymupdf"
+# Below this many pages the process start-up cost outweighs the speed-up.
+PARALLEL_MIN_PAGES = 64
+
+
+def _open_pymupdf(source):
+    import pymupdf
+    if isinstance(source, (bytes, bytearray)):
+        return pymupdf.open(stream=source, filetype="pdf")
+    return pymupdf.open(source)
+
+
+def _open_pypdf2(source):
+    from PyPDF2 import PdfReader
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    return PdfReader(source)
+
+
+def page_count(source, backend=DEFAULT_BACKEND):
+    if backend == "pymupdf":
+        with _open_pymupdf(source) as document:
+            return document.page_count
+    return len(_open_pypdf2(source).pages)
+
+
+def iter_pdf_pages(source, backend=DEFAULT_BACKEND, start=0, stop=None):
+    """Yield (page_number, text) for pages [start, stop), numbered from 1."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "pymupdf":
+        with _open_pymupdf(source) as document:
+            stop = document.page_count if stop is None else min(stop, document.page_count)
+            for index in range(start, stop):
+                yield index + 1, document.load_page(index).get_text()
+    else:
+        pages = _open_pypdf2(source).pages
+        stop = len(pages) if stop is None else min(stop, len(pages))
+        for index in range(start, stop):
+            yield index + 1, pages[index].extract_text() or ""
+
+
+def _extract_range(source, backend, start, stop):
+    return list(iter_pdf_pages(source, backend, start, stop))
+
+
+def extract_pdf_pages(source, backend=DEFAULT_BACKEND, workers=None):
+    """Return a list of (page_number, text) for every page.
+
+    With ``workers`` > 1 and a large enough document, contiguous page ranges
+    are extracted in separate processes.
+    """
+    if isinstance(source, Path):
+        source = str(source)
+    workers = workers if workers is not None else 1
+    if workers <= 1:
+        return list(iter_pdf_pages(source, backend))
+
+    total = page_count(source, backend)
+    if total < PARALLEL_MIN_PAGES:
+        return list(iter_pdf_pages(source, backend))
+
+    workers = min(workers, os.cpu_count() or 1)
+    step = -(-total // workers)
+    ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+    with process_pool(len(ranges)) as pool:
+        parts = pool.map(
+            _extract_range,
+            [source] * len(ranges), [backend] * len(ranges),
+            [start for start, _ in ranges], [stop for _, stop in ranges],
+        )
+        return [page for part in parts for page in part]
+
+
+def extract_pdf_text(source, backend=DEFAULT_BACKEND, workers=None):
+    """Extract the whole text of a PDF, joined once."""
+    return "\n".join(text for _, text in extract_pdf_pages(source, backend, workers))
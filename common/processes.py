@@ -0,0 +1,15 @@
+"""Process pools that are safe to start from the Streamlit server.
+
+Parsing and PDF extraction run on process pools started from worker
+threads of a multi-threaded server. A forked child inherits every lock of
+the parent as it was at fork time, including ones another thread was
+holding, and can deadlock on the first one it touches. Pools are therefore
+spawned: workers start a fresh interpreter and import what they need.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(max_workers):
+    """A ``ProcessPoolExecutor`` whose workers are spawned, not forked."""
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
@@ -0,0 +1,95 @@
+"""Maximal-marginal-relevance reranking of retrieved chunks under a token budget.
+
+Neighbouring chunks of one campuslabs page (and overlapping chunks of one
+syllabus) are near-duplicates, so the top few hits of a query often repeat
+each other and the prompt pays for the same text several times.
+``diversify`` takes an over-fetched candidate list (``hybrid_query`` with
+``n_results=MMR_CANDIDATES``), loads the candidates' stored embeddings and
+picks chunks greedily by
+
+    lambda * relevance - (1 - lambda) * (max similarity to the chunks picked so far)
+
+Relevance comes from the retrieval ranking itself (1 for the best candidate
+down to 1/n for the last), so exact names that BM25 put first keep their
+lead. The pairwise similarities are one matrix product and each pick is a
+vector update, so reranking a dozen candidates takes well under a
+millisecond. Chunks that no longer fit the remaining ``token_budget`` are
+skipped in favour of shorter ones. ``diversify_hits`` does the same for
+merged ``FederatedSearch`` candidates.
+"""
+import time
+
+import numpy as np
+
+from common.tokens import count_tokens
+
+MMR_CANDIDATES = 12
+MMR_LAMBDA = 0.7
+
+
+def mmr_select(relevance, embeddings, k, lambda_mult=MMR_LAMBDA, token_counts=None, token_budget=None):
+    """Return the indices of up to k rows chosen by MMR, in pick order."""
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    if n == 0 or k <= 0:
+        return []
+    vectors = np.asarray(embeddings, dtype=np.float32).reshape(n, -1)
+    vectors = vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+    similarity = vectors @ vectors.T
+
+    costs = np.zeros(n) if token_counts is None else np.asarray(token_counts, dtype=np.float64)
+    remaining = np.inf if token_budget is None else float(token_budget)
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    picked = []
+    while len(picked) < k:
+        available &= costs <= remaining
+        if not available.any():
+            break
+        scores = np.where(available, lambda_mult * relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        picked.append(best)
+        available[best] = False
+        remaining -= costs[best]
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def _pick(vectors, documents, n_results, token_budget, lambda_mult):
+    """MMR over candidates in rank order; returns (chosen positions, their tokens)."""
+    rows = [i for i, vector in enumerate(vectors) if vector is not None]
+    tokens = [count_tokens(documents[i]) for i in rows]
+    relevance = 1.0 - np.arange(len(rows)) / max(len(rows), 1)
+    picked = mmr_select(relevance, [vectors[i] for i in rows], n_results, lambda_mult, tokens, token_budget)
+    return [rows[i] for i in picked], sum(tokens[i] for i in picked)
+
+
+def diversify(collection, result, n_results=3, token_budget=None, lambda_mult=MMR_LAMBDA):
+    """Rerank a one-query Chroma-style result with MMR; returns ``(result, info)``.
+
+    result must include ``documents``; every other key is carried over for
+    the chosen chunks. ``info`` has the number of candidates, the tokens of
+    the chosen documents and the time taken in seconds.
+    """
+    start = time.perf_counter()
+    ids = result["ids"][0] if result["ids"] else []
+    fetched = collection.get(ids=ids, include=["embeddings"]) if ids else {"ids": [], "embeddings": []}
+    vectors = dict(zip(fetched["ids"], fetched["embeddings"]))
+    chosen, tokens = _pick([vectors.get(id_) for id_ in ids], result["documents"][0] if ids else [],
+                           n_results, token_budget, lambda_mult)
+    reranked = {key: [[values[0][i] for i in chosen]] if values else values for key, values in result.items()}
+    info = {"candidates": len(ids), "context_tokens": tokens, "mmr_s": time.perf_counter() - start}
+    return reranked, info
+
+
+def diversify_hits(federation, hits, n_results=3, token_budget=None, lambda_mult=MMR_LAMBDA):
+    """``diversify`` for ``FederatedSearch.search`` hits (best first); returns ``(hits, info)``.
+
+    Source quotas apply to the candidates, not to what MMR keeps; chunks of
+    different collections are rarely similar, so the mix mostly survives.
+    """
+    start = time.perf_counter()
+    chosen, tokens = _pick(federation.embeddings(hits), [hit.document for hit in hits],
+                           n_results, token_budget, lambda_mult)
+    info = {"candidates": len(hits), "context_tokens": tokens, "mmr_s": time.perf_counter() - start}
+    return [hits[i] for i in chosen], info
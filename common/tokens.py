@@ -0,0 +1,26 @@
+"""Token counting shared by the chunkers, batchers and prompt builders."""
+from functools import lru_cache
+
+# text-embedding-3-small and the gpt-4o family both tokenize close enough to
+# cl100k_base for budgeting purposes.
+DEFAULT_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name=DEFAULT_ENCODING):
+    """Load a tiktoken encoding once per process, or None if unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def count_tokens(text, encoding=DEFAULT_ENCODING):
+    """Count tokens in text, falling back to ~4 chars/token without tiktoken."""
+    if not text:
+        return 0
+    enc = get_encoding(encoding)
+    if enc is None:
+        return max(1, len(text) // 4)
+    return len(enc.encode(text, disallowed_special=()))
@@ -0,0 +1,93 @@
+"""Streamed chat completions that may call tools.
+
+A non-streaming completion with ``tools=`` shows nothing until the model
+has generated its whole reply, even when the reply is a plain answer, and
+a tool call can't start until the response has fully arrived.
+``ToolCallStream`` streams instead: iterating it yields text deltas as
+they arrive (so it can go straight into ``st.write_stream``) while
+tool-call deltas are assembled by index. A call whose arguments are
+complete (they parse as JSON, or the next call has started) is passed to
+``on_tool_call`` while the stream is still running, so its work overlaps
+the rest of the generation. Calls still open when the stream ends are only
+collected in ``tool_calls``.
+
+The chunks come from any iterable of chat-completion chunks; the pages pass
+``LLMGateway.stream_sync(..., deltas=True)`` so tool rounds get the
+gateway's deadline, first-token budget and retries.
+"""
+import json
+import time
+from dataclasses import dataclass
+
+
+@dataclass
+class ToolCall:
+    id: str = ""
+    name: str = ""
+    arguments: str = ""
+    complete: bool = False
+
+    def to_message(self):
+        """The call as it appears in an assistant message's ``tool_calls``."""
+        return {"id": self.id, "type": "function", "function": {"name": self.name, "arguments": self.arguments}}
+
+
+def _arguments_complete(arguments):
+    if not arguments.rstrip().endswith("}"):
+        return False
+    try:
+        json.loads(arguments)
+    except ValueError:
+        return False
+    return True
+
+
+class ToolCallStream:
+    def __init__(self, chunks, on_tool_call=None):
+        self.chunks = chunks
+        self.on_tool_call = on_tool_call
+        self.text = ""
+        self.tool_calls = []
+        self.finish_reason = None
+        # perf_counter() values, set while iterating.
+        self.started_at = None
+        self.first_text_at = None
+
+    def _complete(self, call):
+        if not call.complete:
+            call.complete = True
+            if self.on_tool_call is not None:
+                self.on_tool_call(call)
+
+    def _add(self, part):
+        while part.index >= len(self.tool_calls):
+            # A new call starting means the one before it is finished.
+            if self.tool_calls:
+                self._complete(self.tool_calls[-1])
+            self.tool_calls.append(ToolCall())
+        call = self.tool_calls[part.index]
+        if part.id:
+            call.id = part.id
+        if part.function is not None:
+            call.name += part.function.name or ""
+            call.arguments += part.function.arguments or ""
+            if call.id and call.name and _arguments_complete(call.arguments):
+                self._complete(call)
+
+    def __iter__(self):
+        self.started_at = time.perf_counter()
+        for chunk in self.chunks:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            for part in choice.delta.tool_calls or ():
+                self._add(part)
+            if choice.delta.content:
+                if self.first_text_at is None:
+                    self.first_text_at = time.perf_counter()
+                self.text += choice.delta.content
+                yield choice.delta.content
+            if choice.finish_reason:
+                self.finish_reason = choice.finish_reason
+        for call in self.tool_calls:
+            call.complete = True
@@ -0,0 +1,214 @@
+"""Per-request timing spans with a rotating JSONL export.
+
+A ``Trace`` collects spans for one request (one chat turn, one ingestion
+run). Spans use OpenTelemetry field names (``trace_id``, ``span_id``,
+``parent_span_id``, ``start_time_unix_nano``, ``end_time_unix_nano``,
+``attributes``) so the JSONL file can be loaded by OTel tooling or just
+read with ``jq``.
+
+Tracing is opt-in per request: ``start_trace(..., enabled=False)`` returns
+``NULL_TRACE``, whose methods do nothing, so instrumented code costs a
+method call per stage when diagnostics are off.
+"""
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+TRACE_PATH = Path(os.environ.get("TRACE_PATH", "./.cache/traces/traces.jsonl"))
+TRACE_MAX_BYTES = 5 * 1024 * 1024
+TRACE_BACKUPS = 3
+SERVICE_NAME = "hw-streamlit"
+# Whether the pages' diagnostics checkbox starts ticked.
+TRACING_DEFAULT = os.environ.get("TRACING", "") == "1"
+
+_writer_lock = threading.Lock()
+_logger = None
+
+
+def _trace_logger():
+    global _logger
+    with _writer_lock:
+        if _logger is None:
+            TRACE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(TRACE_PATH, maxBytes=TRACE_MAX_BYTES,
+                                          backupCount=TRACE_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger("hw.traces")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            logger.addHandler(handler)
+            _logger = logger
+        return _logger
+
+
+class Trace:
+    def __init__(self, name, **attributes):
+        self.trace_id = secrets.token_hex(16)
+        self.spans = []
+        self._stack = []
+        self.root = self._new_span(name, time.time_ns(), attributes)
+
+    def _new_span(self, name, start_ns, attributes):
+        span = {
+            "trace_id": self.trace_id,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": self._stack[-1]["span_id"] if self._stack else None,
+            "name": name,
+            "start_time_unix_nano": start_ns,
+            "end_time_unix_nano": None,
+            "attributes": dict(attributes),
+            "status": {"code": "UNSET"},
+        }
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block as a child of the current span."""
+        span = self._new_span(name, time.time_ns(), attributes)
+        try:
+            yield span["attributes"]
+        except BaseException as e:
+            span["status"] = {"code": "ERROR", "message": str(e)}
+            raise
+        finally:
+            span["end_time_unix_nano"] = time.time_ns()
+            self._stack.remove(span)
+
+    def record(self, name, seconds, end_ns=None, **attributes):
+        """Add a span measured elsewhere that lasted seconds and ended at end_ns."""
+        end_ns = end_ns or time.time_ns()
+        span = self._new_span(name, end_ns - int(seconds * 1e9), attributes)
+        span["end_time_unix_nano"] = end_ns
+        self._stack.remove(span)
+
+    def set(self, **attributes):
+        """Add attributes to the root span."""
+        self.root["attributes"].update(attributes)
+
+    def end(self, export=True):
+        """Close the root span and append every span to the trace file."""
+        if self.root["end_time_unix_nano"] is None:
+            self.root["end_time_unix_nano"] = time.time_ns()
+            self._stack.clear()
+            if export:
+                logger = _trace_logger()
+                resource = {"service.name": SERVICE_NAME}
+                for span in self.spans:
+                    logger.info(json.dumps({**span, "resource": resource}))
+        return self
+
+    def summary(self):
+        """``[(indent, name, milliseconds, attributes)]`` in start order, for display."""
+        depth = {None: -1}
+        rows = []
+        for span in sorted(self.spans, key=lambda s: s["start_time_unix_nano"]):
+            depth[span["span_id"]] = depth.get(span["parent_span_id"], 0) + 1
+            end = span["end_time_unix_nano"] or time.time_ns()
+            rows.append((depth[span["span_id"]], span["name"],
+                         (end - span["start_time_unix_nano"]) / 1e6, span["attributes"]))
+        return rows
+
+    def format(self):
+        """The span tree as an aligned text table."""
+        lines = []
+        for indent, name, ms, attributes in self.summary():
+            extra = " ".join(f"{key}={value}" for key, value in attributes.items())
+            lines.append(f"{'  ' * indent}{name:<{22 - 2 * indent}} {ms:9.1f} ms  {extra}".rstrip())
+        return "\n".join(lines)
+
+
+class _NullTrace:
+    spans = ()
+
+    def span(self, name, **attributes):
+        return nullcontext({})
+
+    def record(self, name, seconds, end_ns=None, **attributes):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, export=True):
+        return self
+
+    def summary(self):
+        return []
+
+    def format(self):
+        return ""
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_trace(name, enabled=True, **attributes):
+    return Trace(name, **attributes) if enabled else NULL_TRACE
+
+
+def record_stages(trace, stages, end_ns=None):
+    """Record back-to-back ``(name, seconds, attributes)`` stages ending at end_ns.
+
+    For code that measures its own stages (``hybrid_query``'s ``info``, the
+    gateway's ``CallStats``) instead of running inside ``trace.span``.
+    """
+    end_ns = end_ns or time.time_ns()
+    start_ns = end_ns - int(sum(seconds for _, seconds, _ in stages) * 1e9)
+    for name, seconds, attributes in stages:
+        start_ns += int(seconds * 1e9)
+        trace.record(name, seconds, start_ns, **attributes)
+
+
+def record_llm_call(trace, stats, text, name="llm", **attributes):
+    """Record a gateway call (``CallStats``) with its first-token and stream stages."""
+    if trace is NULL_TRACE or stats.total is None:
+        return
+    from common.tokens import count_tokens
+
+    tokens = count_tokens(text or "")
+    ttft = stats.time_to_first_token or 0.0
+    streaming = max(stats.total - ttft, 0.0)
+    end_ns = time.time_ns()
+    span = trace._new_span(name, end_ns - int(stats.total * 1e9), {
+        "route": stats.route, "attempts": stats.attempts, "hedged": stats.hedged,
+        "output_tokens": tokens, "tokens_per_s": round(tokens / streaming, 1) if streaming else None,
+        **attributes,
+    })
+    record_stages(trace, [(f"{name}.first_token", ttft, {}), (f"{name}.stream", streaming, {})], end_ns)
+    span["end_time_unix_nano"] = end_ns
+    trace._stack.remove(span)
+
+
+def diagnostics_toggle():
+    """Page UI: the sidebar "Show diagnostics" checkbox; returns whether it is ticked."""
+    import streamlit as st
+
+    return st.sidebar.checkbox(
+        "Show diagnostics", value=TRACING_DEFAULT, key="diagnostics",
+        help="Time each stage of a request and append the spans to the trace file.",
+    )
+
+
+def keep_trace(page_key, trace):
+    """End trace and keep its table for the page's diagnostics panel (no-op when tracing is off)."""
+    import streamlit as st
+
+    if trace is not NULL_TRACE:
+        st.session_state[f"{page_key}_trace"] = trace.end().format()
+
+
+def show_diagnostics(page_key):
+    """Page UI: the last request's trace in the sidebar while diagnostics are on."""
+    import streamlit as st
+
+    if st.session_state.get("diagnostics") and st.session_state.get(f"{page_key}_trace"):
+        with st.sidebar.expander("Diagnostics (last request)", expanded=True):
+            st.code(st.session_state[f"{page_key}_trace"], language=None)
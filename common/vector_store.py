@@ -0,0 +1,303 @@
+"""Vector store backends behind the subset of the Chroma collection API we use.
+
+Ingestion (``common.ingest``) and the pages only call ``upsert``, ``delete``,
+``get``, ``count`` and ``query`` on a collection, so any object with those
+methods can stand in for a Chroma collection. ``open_collection`` picks the
+backend:
+
+* ``chroma``: a ``chromadb.PersistentClient`` collection (the default).
+* ``numpy``: ``NumpyVectorStore``, unit-normalized float32 vectors in a
+  ``.npy`` file that is memory-mapped on open, with a JSON sidecar for ids,
+  documents and metadata. Top-k is one matrix multiply for all queries.
+* ``numpy-int8``: the same, with vectors quantized to int8 and a float32
+  scale per row (4x smaller on disk and in the page cache).
+
+The backend can be chosen with the ``VECTOR_STORE_BACKEND`` environment
+variable. Each backend keeps its own ingestion manifest (``manifest_path``)
+so switching backends re-embeds into the new store instead of trusting the
+other store's manifest.
+"""
+import functools
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+BACKENDS = ("chroma", "numpy", "numpy-int8")
+DEFAULT_BACKEND = "chroma"
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+QUERY_BLOCK_ROWS = 8192
+
+
+def default_backend():
+    backend = os.environ.get("VECTOR_STORE_BACKEND", DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown vector store backend {backend!r}; expected one of {BACKENDS}")
+    return backend
+
+
+def manifest_path(path, name, backend=None):
+    backend = backend or default_backend()
+    suffix = "" if backend == "chroma" else f".{backend}"
+    return Path(path) / f"{name}{suffix}.manifest.json"
+
+
+_sqlite_checked = False
+
+
+def _open_chroma(path, name):
+    global _sqlite_checked
+    # Chroma needs a newer sqlite3 than some hosts ship. The swap pops
+    # pysqlite3 from sys.modules, so remember that it was tried.
+    if not _sqlite_checked:
+        try:
+            __import__('pysqlite3')
+            sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+        except ImportError:
+            pass
+        _sqlite_checked = True
+    import chromadb
+    return chromadb.PersistentClient(path=str(path)).get_or_create_collection(name)
+
+
+def open_collection(path, name, backend=None):
+    """Open (or create) the named collection under path."""
+    backend = backend or default_backend()
+    if backend == "chroma":
+        return _open_chroma(path, name)
+    if backend in ("numpy", "numpy-int8"):
+        return NumpyVectorStore(path, name, quantize=backend == "numpy-int8")
+    raise ValueError(f"Unknown vector store backend {backend!r}; expected one of {BACKENDS}")
+
+
+def _matches(metadata, where):
+    for key, condition in where.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$eq" and value != operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _quantize(vectors):
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def _synchronized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class NumpyVectorStore:
+    """Chroma-compatible collection over a memory-mapped embedding matrix.
+
+    Writes are kept in memory until ``flush`` (called by ``sync_folder``),
+    which rewrites the files atomically. ``query`` distances are cosine
+    distances (1 - cosine similarity).
+    """
+
+    def __init__(self, path, name, quantize=False):
+        self.path = Path(path)
+        self.name = name
+        self.quantize = quantize
+        stem = f"{name}.int8" if quantize else name
+        self._meta_path = self.path / f"{stem}.json"
+        self._vectors_path = self.path / f"{stem}.npy"
+        self._scales_path = self.path / f"{stem}.scales.npy"
+        self._dirty = False
+        # Sessions query while the ingestion worker writes.
+        self._lock = threading.RLock()
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _load(self):
+        self._ids, self._documents, self._metadatas = [], [], []
+        self._matrix = None
+        self._scales = None
+        if self._meta_path.exists():
+            meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+            self._ids = meta["ids"]
+            self._documents = meta["documents"]
+            self._metadatas = meta["metadatas"]
+            if self._ids:
+                self._matrix = np.load(self._vectors_path, mmap_mode="r")
+                if self.quantize:
+                    self._scales = np.load(self._scales_path)
+        self._rows = {id_: i for i, id_ in enumerate(self._ids)}
+
+    @_synchronized
+    def flush(self):
+        """Write pending changes to disk and re-map the matrix read-only."""
+        if not self._dirty:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self._matrix is not None:
+            for target, array in ((self._vectors_path, self._matrix), (self._scales_path, self._scales)):
+                if array is None:
+                    continue
+                tmp = target.with_name(target.name + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp, target)
+        meta = {
+            "version": 1,
+            "dtype": "int8" if self.quantize else "float32",
+            "dim": None if self._matrix is None else int(self._matrix.shape[1]),
+            "ids": self._ids,
+            "documents": self._documents,
+            "metadatas": self._metadatas,
+        }
+        tmp = self._meta_path.with_name(self._meta_path.name + ".tmp")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, self._meta_path)
+        self._dirty = False
+        self._load()
+
+    def _writable(self):
+        # The mapped matrix is read-only; copy it before the first change.
+        if isinstance(self._matrix, np.memmap):
+            self._matrix = np.array(self._matrix)
+        self._dirty = True
+
+    # -- Chroma collection API --------------------------------------------
+
+    @_synchronized
+    def count(self):
+        return len(self._ids)
+
+    @_synchronized
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+        if self.quantize:
+            rows, scales = _quantize(vectors)
+        else:
+            rows, scales = vectors, None
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+
+        self._writable()
+        existing = [(i, self._rows[id_]) for i, id_ in enumerate(ids) if id_ in self._rows]
+        for i, row in existing:
+            self._matrix[row] = rows[i]
+            if self.quantize:
+                self._scales[row] = scales[i]
+            self._documents[row] = documents[i]
+            self._metadatas[row] = metadatas[i]
+        seen = {i for i, _ in existing}
+        new = [i for i in range(len(ids)) if i not in seen]
+        if new:
+            self._matrix = rows[new] if self._matrix is None else np.concatenate([self._matrix, rows[new]])
+            if self.quantize:
+                self._scales = scales[new] if self._scales is None else np.concatenate([self._scales, scales[new]])
+            for i in new:
+                self._rows[ids[i]] = len(self._ids)
+                self._ids.append(ids[i])
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+
+    def _select(self, ids=None, where=None):
+        rows = range(len(self._ids)) if ids is None else [self._rows[i] for i in ids if i in self._rows]
+        if where:
+            rows = [row for row in rows if _matches(self._metadatas[row] or {}, where)]
+        return list(rows)
+
+    @_synchronized
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            return
+        drop = set(self._select(ids, where))
+        if not drop:
+            return
+        keep = [row for row in range(len(self._ids)) if row not in drop]
+        self._writable()
+        self._matrix = self._matrix[keep] if keep else None
+        if self.quantize:
+            self._scales = self._scales[keep] if keep else None
+        self._ids = [self._ids[row] for row in keep]
+        self._documents = [self._documents[row] for row in keep]
+        self._metadatas = [self._metadatas[row] for row in keep]
+        self._rows = {id_: i for i, id_ in enumerate(self._ids)}
+
+    @_synchronized
+    def get(self, ids=None, where=None, include=("documents", "metadatas")):
+        rows = self._select(ids, where)
+        result = {"ids": [self._ids[row] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [self._documents[row] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [self._metadatas[row] for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._vectors(rows)
+        return result
+
+    def _vectors(self, rows):
+        """Stored (unit-length) float32 vectors of rows, dequantized."""
+        if not rows:
+            return np.zeros((0, 0 if self._matrix is None else self._matrix.shape[1]), dtype=np.float32)
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        if self.quantize:
+            vectors = vectors * self._scales[rows][:, None]
+        return vectors
+
+    @_synchronized
+    def similarities(self, query_embeddings):
+        """Cosine similarity of every stored vector to each query, shape (queries, rows)."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+        if not self.quantize:
+            return queries @ self._matrix.T
+        # Dequantize a block of rows at a time to bound the float32 copy.
+        scores = np.empty((len(queries), len(self._ids)), dtype=np.float32)
+        for start in range(0, len(self._ids), QUERY_BLOCK_ROWS):
+            block = self._matrix[start:start + QUERY_BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        return scores * self._scales
+
+    @_synchronized
+    def query(self, query_embeddings, n_results=10, where=None, include=DEFAULT_INCLUDE):
+        n_queries = len(query_embeddings)
+        result = {"ids": [[] for _ in range(n_queries)]}
+        for key in include:
+            result[key] = [[] for _ in range(n_queries)]
+        if self._matrix is None:
+            return result
+
+        scores = self.similarities(query_embeddings)
+        if where:
+            mask = np.full(len(self._ids), -np.inf, dtype=np.float32)
+            mask[self._select(where=where)] = 0.0
+            scores = scores + mask
+        k = min(n_results, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for q in range(n_queries):
+            rows = top[q][np.argsort(-scores[q, top[q]])]
+            rows = [row for row in rows if np.isfinite(scores[q, row])]
+            result["ids"][q] = [self._ids[row] for row in rows]
+            if "documents" in include:
+                result["documents"][q] = [self._documents[row] for row in rows]
+            if "metadatas" in include:
+                result["metadatas"][q] = [self._metadatas[row] for row in rows]
+            if "distances" in include:
+                result["distances"][q] = [float(1.0 - scores[q, row]) for row in rows]
+        return result